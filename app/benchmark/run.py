@@ -0,0 +1,189 @@
+"""
+Offline end-to-end benchmark.
+
+Replays every qna.json question through the CLI pipeline orchestrator with a deterministic
+stub LLM, an in-process vector store and the embedded SQLite backend, then reports per-stage
+and end-to-end p50/p95/p99 latency plus throughput. Results are saved under benchmark/results/
+and compared with the previous run.
+
+    cd app && python -m benchmark.run --concurrency 4
+"""
+import os
+import json
+import math
+import time
+import logging
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import typer
+from rich.console import Console
+from rich.table import Table
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Settings are validated at import time; the benchmark never reaches these services
+OFFLINE_ENV = {
+    "OPENAI_API_KEY": "offline",
+    "OPENAI_BASE_URL": "http://localhost",
+    "OPENAI_MODEL": "sqlwise-stub",
+    "COHERE_API_KEY": "offline",
+    "QDRANT_URL": "http://localhost:6333",
+    "TOKENIZERS_PARALLELISM": "false",
+}
+
+app = typer.Typer(rich_markup_mode="rich")
+console = Console()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def summarize(samples: dict[str, list[float]]) -> dict:
+    return {
+        stage: {
+            "count": len(values),
+            "mean": round(sum(values) / len(values), 3),
+            "p50": round(percentile(values, 50), 3),
+            "p95": round(percentile(values, 95), 3),
+            "p99": round(percentile(values, 99), 3),
+        }
+        for stage, values in samples.items() if values
+    }
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=APP_DIR)
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def latest_result(output_dir: str):
+    if not os.path.isdir(output_dir):
+        return None
+    files = sorted(f for f in os.listdir(output_dir) if f.endswith(".json"))
+    if not files:
+        return None
+    with open(os.path.join(output_dir, files[-1]), "r") as f:
+        return json.load(f)
+
+
+def print_report(report: dict, previous):
+    table = Table(title=f"Pipeline latency (ms) @ {report['commit']}")
+    for column in ("stage", "count", "p50", "p95", "p99", "Δp50 vs prev"):
+        table.add_column(column, justify="left" if column == "stage" else "right")
+
+    previous_stages = (previous or {}).get("stages", {})
+    for stage, stats in report["stages"].items():
+        delta = ""
+        if stage in previous_stages and previous_stages[stage]["p50"]:
+            change = (stats["p50"] - previous_stages[stage]["p50"]) / previous_stages[stage]["p50"] * 100
+            delta = f"{change:+.1f}%"
+        table.add_row(stage, str(stats["count"]), f"{stats['p50']:.2f}", f"{stats['p95']:.2f}", f"{stats['p99']:.2f}", delta)
+
+    console.print(table)
+    console.print(
+        f"[bold]{report['questions']}[/bold] questions, [bold]{report['failures']}[/bold] failed, "
+        f"throughput [bold green]{report['throughput_qps']:.2f} q/s[/bold green] "
+        f"(concurrency {report['config']['concurrency']})"
+    )
+    if previous:
+        console.print(f"Previous run: {previous['commit']} at {previous['timestamp']}, {previous['throughput_qps']:.2f} q/s")
+
+
+@app.command()
+def main(
+    limit: int = typer.Option(0, help="Replay only the first N questions (0 = all)."),
+    repeat: int = typer.Option(1, help="Replay the question set this many times."),
+    concurrency: int = typer.Option(1, help="Questions in flight at once."),
+    llm_latency_ms: float = typer.Option(0.0, help="Simulated latency per stub LLM call."),
+    fast_path: bool = typer.Option(False, help="Enable the verified-SQL fast path."),
+    cache: bool = typer.Option(False, help="Enable the semantic and SQL result caches."),
+    stream: bool = typer.Option(False, help="Stream the analysis (adds analysis_first_token timings)."),
+    output_dir: str = typer.Option(RESULTS_DIR, help="Where result files are written."),
+    save: bool = typer.Option(True, help="Save the results file."),
+):
+    """
+    [bold green]Offline pipeline benchmark[/bold green]
+    """
+    for key, value in OFFLINE_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["QNA_FAST_PATH_THRESHOLD"] = "0.92" if fast_path else "0"
+    os.environ["SEMANTIC_CACHE_ENABLED"] = str(cache).lower()
+    os.environ["SEMANTIC_CACHE_PATH"] = ""
+    os.environ["SQL_CACHE_ENABLED"] = str(cache).lower()
+    # Length-based token estimate, so tiktoken never fetches its BPE file
+    os.environ["TOKEN_ENCODING"] = ""
+    logging.getLogger("sqlglot").setLevel(logging.ERROR)
+
+    # The stub LLM must be in place before the pipeline module builds its agents
+    import src.llm
+    import src.rag
+    from benchmark.stubs import build_stub_llm, StubRAGPipeline, load_chunks
+    src.llm.llm = build_stub_llm(latency_ms=llm_latency_ms)
+    src.rag._shared_pipeline = StubRAGPipeline()
+
+    import cli
+
+    questions = [chunk["question"] for chunk in load_chunks("qna")]
+    if limit:
+        questions = questions[:limit]
+    questions = questions * max(repeat, 1)
+
+    def run_question(question: str) -> dict:
+        final = {}
+        for update in cli.run_pipeline_orchestrator(question, stream_analysis=stream):
+            final = update
+        return final
+
+    console.print(f"Replaying {len(questions)} questions with concurrency {concurrency}...")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        finals = list(executor.map(run_question, questions))
+    wall = time.perf_counter() - started
+
+    samples: dict[str, list[float]] = {}
+    failures = 0
+    for final in finals:
+        if "error" in final:
+            failures += 1
+        for stage, ms in final.get("timings_ms", {}).items():
+            samples.setdefault(stage, []).append(ms)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "questions": len(questions), "concurrency": concurrency, "llm_latency_ms": llm_latency_ms,
+            "fast_path": fast_path, "cache": cache, "stream": stream,
+        },
+        "questions": len(questions),
+        "failures": failures,
+        "wall_seconds": round(wall, 3),
+        "throughput_qps": round(len(questions) / wall, 3) if wall else 0.0,
+        "stages": summarize(samples),
+    }
+
+    previous = latest_result(output_dir)
+    print_report(report, previous)
+
+    if save:
+        os.makedirs(output_dir, exist_ok=True)
+        filename = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{report['commit']}.json"
+        with open(os.path.join(output_dir, filename), "w") as f:
+            json.dump(report, f, indent=2)
+        console.print(f"✅ Saved results to {os.path.join(output_dir, filename)}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,167 @@
+import os
+import re
+import json
+import math
+import time
+import hashlib
+from typing import Any, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from src import prompts
+from schema import SqlResponse, QueryPlan
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNK_DIR = os.path.join(APP_DIR, "json_chunks")
+
+
+def load_chunks(name: str) -> list[dict]:
+    with open(os.path.join(CHUNK_DIR, f"{name}.json"), "r") as f:
+        return json.load(f)
+
+
+def _normalize_question(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+# ─── Stub LLM ─────────────────────────────────────────────────────
+
+class StubChatModel(BaseChatModel):
+    """
+    Deterministic chat model that replays the knowledge base instead of calling a provider.
+    SQLAgent gets the stored sql_query of the matching qna.json question; every other agent
+    gets a fixed, schema-valid answer. latency_ms simulates provider round-trips.
+    """
+
+    qna_by_question: dict = {}
+    latency_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "sqlwise-stub"
+
+    def _sleep(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    @staticmethod
+    def _split(messages: list[BaseMessage]) -> tuple[str, str]:
+        system = next((m.content for m in messages if m.type == "system"), "")
+        user = next((m.content for m in messages if m.type == "human"), "")
+        return system, user
+
+    def _lookup(self, user: str) -> Optional[dict]:
+        match = re.search(r"Question:\s*(.+)", user)
+        question = match.group(1) if match else user.split(" \n ")[0]
+        return self.qna_by_question.get(_normalize_question(question))
+
+    def _respond(self, messages: list[BaseMessage], schema=None) -> Any:
+        self._sleep()
+        system, user = self._split(messages)
+
+        if schema is QueryPlan:
+            chunk = self._lookup(user) or {}
+            tables = chunk.get("metadata", {}).get("tables", [])
+            return QueryPlan(
+                tables_needed=tables, join_strategy="stub", filters="stub", aggregations="stub",
+                sorting="stub", computed_columns="stub", full_plan="stub plan",
+            )
+        if schema is SqlResponse:
+            if system == prompts.self_healer_prompt:
+                failed = re.search(r"Failed SQL Query:\n(.*?)\n\nError", user, re.S)
+                return SqlResponse(query=failed.group(1) if failed else "SELECT 1 AS value", explanation="stub heal")
+            if system == prompts.query_validator_prompt:
+                return SqlResponse(query=user.split(" \n ", 1)[-1].strip(), explanation="stub validation")
+            chunk = self._lookup(user)
+            sql = chunk["sql_query"] if chunk else "SELECT 1 AS value"
+            return SqlResponse(query=sql, explanation="stub replay")
+        if system == prompts.query_rewriter_prompt:
+            return user.split(" \n ")[0]
+        return f"Stub analysis over {len(user)} characters of result data."
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        content = self._respond(messages)
+        usage = {"input_tokens": sum(len(str(m.content)) for m in messages) // 4, "output_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        message = AIMessage(content=content, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs):
+        content = self._respond(messages)
+        for word in re.findall(r"\S+\s*", content):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+    def with_structured_output(self, schema, *, include_raw: bool = False, **kwargs):
+        def invoke(prompt_value):
+            messages = prompt_value.to_messages()
+            parsed = self._respond(messages, schema=schema)
+            if include_raw:
+                raw = AIMessage(content=parsed.model_dump_json())
+                return {"raw": raw, "parsed": parsed, "parsing_error": None}
+            return parsed
+        return RunnableLambda(invoke)
+
+
+def build_stub_llm(latency_ms: float = 0.0) -> StubChatModel:
+    qna = {_normalize_question(chunk["question"]): chunk for chunk in load_chunks("qna")}
+    return StubChatModel(qna_by_question=qna, latency_ms=latency_ms)
+
+
+# ─── In-process vector store stand-in ─────────────────────────────
+
+_TOKEN = re.compile(r"[a-z0-9_]+")
+
+
+def hash_embedding(text: str, dim: int = 256) -> list[float]:
+    """Deterministic bag-of-words embedding: tokens are hashed into dim buckets, then L2-normalized."""
+    vector = [0.0] * dim
+    for token in _TOKEN.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode(), digest_size=4).digest()
+        vector[int.from_bytes(digest, "little") % dim] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class StubRAGPipeline:
+    """Drop-in for RAGPipeline that searches the json_chunks files in memory with hash embeddings."""
+
+    def __init__(self, collections=("db", "business_logic", "qna")):
+        self._docs: dict[str, list[tuple[list[float], dict]]] = {}
+        for name in collections:
+            docs = []
+            for chunk in load_chunks(name):
+                metadata = chunk.get("metadata", {})
+                data = {key: value for key, value in chunk.items() if key != "metadata"}
+                # Same page_content layout as src.rag.chunk_document
+                doc = {"id": None, "metadata": metadata, "page_content": f"{data}", "type": "Document"}
+                docs.append((hash_embedding(doc["page_content"]), doc))
+            self._docs[name] = docs
+
+    def embed_query(self, user_query: str) -> list[float]:
+        return hash_embedding(user_query)
+
+    async def aembed_query(self, user_query: str) -> list[float]:
+        return self.embed_query(user_query)
+
+    def query_by_vector(self, query_vector: list[float], collection_name: str, k=3):
+        scored = [
+            (sum(a * b for a, b in zip(query_vector, vector)), doc)
+            for vector, doc in self._docs.get(collection_name, [])
+        ]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [{**doc, "score": score} for score, doc in scored[:k]]
+
+    def query_collections(self, user_query: str, collections: dict[str, int], query_vector: Optional[list[float]] = None):
+        if query_vector is None:
+            query_vector = self.embed_query(user_query)
+        return {name: self.query_by_vector(query_vector, name, k) for name, k in collections.items()}
+
+    async def aquery_collections(self, user_query: str, collections: dict[str, int], query_vector: Optional[list[float]] = None):
+        return self.query_collections(user_query, collections, query_vector)
+
+    def warm_up(self, collections=()):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,97 @@
+"""
+TOON encoder micro-benchmark.
+
+Times the reference recursive encoder (utils.utils.json_to_toon) against the single-buffer encoder
+(utils.toon.encode_toon) on the payloads the app encodes: the knowledge-base chunks behind the
+agent context, the setup schema dump and a large query result. Also checks that both encoders
+produce identical text and that decode_toon reads it back.
+
+    cd app && python -m benchmark.toon --repeat 20
+"""
+import os
+import sqlite3
+import timeit
+import typer
+from rich.console import Console
+from rich.table import Table
+from benchmark.run import OFFLINE_ENV
+
+app = typer.Typer(rich_markup_mode="rich")
+console = Console()
+
+
+def build_payloads(result_rows: int) -> dict:
+    from benchmark.stubs import load_chunks
+    from db_setup.sqlite_backend import load_csvs
+
+    conn = sqlite3.connect(":memory:")
+    load_csvs(conn)
+    schema: dict = {}
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name").fetchall():
+        for _cid, column, data_type, *_ in conn.execute(f'PRAGMA table_info("{table}")').fetchall():
+            schema.setdefault(table, []).append({"column": column, "type": data_type or "TEXT"})
+
+    cursor = conn.execute(f"SELECT * FROM order_items LIMIT {result_rows}")
+    columns = [c[0] for c in cursor.description]
+    rows = cursor.fetchall()
+    conn.close()
+
+    return {
+        "knowledge chunks": {name: load_chunks(name) for name in ("db", "business_logic", "qna")},
+        "setup schema": schema,
+        f"result ({len(rows)} rows)": {"row_count": len(rows), "rows": [dict(zip(columns, row)) for row in rows]},
+        "_table": (columns, rows),
+    }
+
+
+def best_ms(fn, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+@app.command()
+def main(
+    repeat: int = typer.Option(20, help="Timing runs per payload; the best run is reported."),
+    result_rows: int = typer.Option(10000, help="Rows in the query-result payload."),
+):
+    """Compare the reference and single-buffer TOON encoders."""
+    for key, value in OFFLINE_ENV.items():
+        os.environ.setdefault(key, value)
+    from utils.utils import json_to_toon
+    from utils.toon import encode_toon, iter_toon_table, decode_toon
+
+    payloads = build_payloads(result_rows)
+    columns, rows = payloads.pop("_table")
+
+    table = Table(title="TOON encoding (ms, best of runs)")
+    for column in ("payload", "chars", "reference", "encode_toon", "speedup", "identical", "decode", "round-trip"):
+        table.add_column(column, justify="left" if column == "payload" else "right")
+
+    for name, payload in payloads.items():
+        reference = json_to_toon(payload)
+        fast = encode_toon(payload)
+        old_ms = best_ms(lambda: json_to_toon(payload), repeat)
+        new_ms = best_ms(lambda: encode_toon(payload), repeat)
+        decode_ms = best_ms(lambda: decode_toon(fast), max(repeat // 4, 1))
+        try:
+            round_trip = "exact" if decode_toon(fast) == payload else "lossy"
+        except ValueError:
+            round_trip = "ambiguous"
+        table.add_row(
+            name, f"{len(fast):,}", f"{old_ms:.2f}", f"{new_ms:.2f}", f"{old_ms / new_ms:.1f}x",
+            "yes" if reference == fast else "[red]no[/red]", f"{decode_ms:.2f}", round_trip,
+        )
+
+    # DB rows straight from the cursor, versus building a dict per row for the reference encoder
+    streamed = "\n".join(iter_toon_table("rows", columns, rows))
+    expected = json_to_toon({"rows": [dict(zip(columns, row)) for row in rows]})
+    old_ms = best_ms(lambda: json_to_toon({"rows": [dict(zip(columns, row)) for row in rows]}), repeat)
+    new_ms = best_ms(lambda: "\n".join(iter_toon_table("rows", columns, rows)), repeat)
+    table.add_row(
+        f"db rows → iter_toon_table ({len(rows)})", f"{len(streamed):,}", f"{old_ms:.2f}", f"{new_ms:.2f}",
+        f"{old_ms / new_ms:.1f}x", "yes" if streamed == expected else "[red]no[/red]", "-", "-",
+    )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    app()
@@ -1,17 +1,163 @@
-import pyodbc
+import re
+import threading
+from contextlib import closing
+from typing import Optional
 from src.config import settings
+from .pool import ConnectionPool
+from .result_cache import SQLResultCache, canonicalize
+from .query_guard import QueryGuard, QueryGuardError, QueryTimeout, Watchdog
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+# ODBC SQLSTATEs of a statement stopped by its query timeout or by SQLCancel; the connection stays usable
+_CANCELLED_STATES = ("HYT00", "HY008")
+_PLAN_COST = re.compile(r'StatementSubTreeCost="([0-9.eE+-]+)"')
+
+
+def _is_cancelled(e: Exception) -> bool:
+    import pyodbc
+    return isinstance(e, pyodbc.Error) and bool(e.args) and e.args[0] in _CANCELLED_STATES
+
+
+def _is_disconnect(e: Exception) -> bool:
+    import pyodbc
+    return isinstance(e, (pyodbc.OperationalError, pyodbc.InterfaceError)) and not _is_cancelled(e)
+
+
+def get_pool(conn_str: str) -> ConnectionPool:
+    """Process-wide pool per connection string, shared by every SQLDB instance."""
+    import pyodbc
+    pool = _pools.get(conn_str)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(conn_str)
+            if pool is None:
+                pool = ConnectionPool(
+                    # Autocommit so no transaction stays open on a connection returned to the pool
+                    connect=lambda: pyodbc.connect(conn_str, autocommit=True),
+                    min_size=settings.DB_POOL_MIN_SIZE,
+                    max_size=settings.DB_POOL_MAX_SIZE,
+                    idle_timeout=settings.DB_POOL_IDLE_TIMEOUT,
+                    health_check_interval=settings.DB_POOL_HEALTH_CHECK_INTERVAL,
+                    checkout_timeout=settings.DB_POOL_TIMEOUT,
+                    is_disconnect=_is_disconnect,
+                )
+                _pools[conn_str] = pool
+    return pool
+
+
+def _estimate_size(value) -> int:
+    """Rough in-memory footprint of a cell, used to enforce the byte cap."""
+    if value is None:
+        return 1
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    return 8
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+class MSSQLBackend:
+    """SQL Server over pyodbc, connections come from the shared pool for the connection string."""
+
+    dialect = "tsql"
+
+    def __init__(self, conn_str: str):
+        self.pool = get_pool(conn_str)
+
+    def connection(self):
+        return self.pool.connection()
+
+    def prepare(self, query: str) -> str:
+        return query
+
+    def is_disconnect(self, e: Exception) -> bool:
+        return _is_disconnect(e)
+
+    def set_timeout(self, conn, seconds: float):
+        # ODBC query timeout for cursors created afterwards; 0 restores "no timeout" on the pooled connection
+        conn.timeout = max(1, round(seconds)) if seconds else 0
+
+    def cancel(self, conn, cursor):
+        cursor.cancel()
+
+    def is_timeout(self, e: Exception) -> bool:
+        return _is_cancelled(e)
+
+    def estimate_cost(self, conn, query: str) -> Optional[float]:
+        """Estimated subtree cost of the query from its SHOWPLAN_XML, without running it."""
+        plans = []
+        with closing(conn.cursor()) as cursor:
+            cursor.execute("SET SHOWPLAN_XML ON")
+            try:
+                cursor.execute(query)
+                while True:
+                    row = cursor.fetchone()
+                    if row:
+                        plans.append(row[0])
+                    if not cursor.nextset():
+                        break
+            finally:
+                cursor.execute("SET SHOWPLAN_XML OFF")
+        costs = [float(cost) for plan in plans for cost in _PLAN_COST.findall(plan)]
+        return max(costs) if costs else None
+
+    def describe(self) -> list[tuple]:
+        """(schema, table, column, data type) for every column in the database."""
+        with self.pool.connection() as conn:
+            with closing(conn.cursor()) as cursor:
+                cursor.execute(
+                    "SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS "
+                    "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+                )
+                return [tuple(row) for row in cursor.fetchall()]
+
+    def close(self):
+        # Pools are shared across instances and closed by close_pools()
+        pass
+
 
 class SQLDB:
-    def __init__(self):
+    """
+    Query executor over a pluggable backend.
+    A backend provides connection() (context manager yielding a DB-API connection),
+    prepare(query) (rewrite the generated T-SQL for its engine), is_disconnect(e),
+    describe() (every column as (schema, table, column, data type)) and close(), plus the hooks
+    the query guard uses: set_timeout(conn, seconds), cancel(conn, cursor), is_timeout(e) and
+    estimate_cost(conn, query) (None when the engine has no cost estimate).
+    DB_BACKEND picks the default: "mssql" (pyodbc, pooled) or "sqlite" (embedded copy of files/*.csv).
+    - guard: QueryGuard applied to every query (read-only, TOP cap, timeout, cost limit); None runs queries as given
+    """
+
+    def __init__(self, result_cache: Optional[SQLResultCache] = None, backend=None, guard: Optional[QueryGuard] = None):
         self.server = settings.DB_SERVER
         self.database = settings.DB_NAME
         self.username = settings.DB_USER
         self.password = settings.DB_PASSWORD
         self.driver = settings.DB_DRIVER
+        self.backend = backend or self._default_backend()
+        self.result_cache = result_cache
+        self.guard = guard
+
+    def _default_backend(self):
+        name = settings.DB_BACKEND.lower()
+        if name == "mssql":
+            return MSSQLBackend(self._connection_string())
+        if name == "sqlite":
+            from .sqlite_backend import get_sqlite_backend
+            return get_sqlite_backend()
+        raise ValueError(f"Unknown DB_BACKEND: {settings.DB_BACKEND}")
     
-    def _get_db_connection(self):
+    def _connection_string(self):
         """
-        Establishes a connection to the MSSQL Server using environment variables.
+        Builds the MSSQL Server connection string from environment variables.
         """
         server = self.server
         database = self.database
@@ -19,34 +165,124 @@ class SQLDB:
         password = self.password
         driver = self.driver
 
-        conn_str = f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}'
-    
-        try:
-            conn = pyodbc.connect(conn_str)
-            return conn
-        except Exception as e:
-            print(f"Error connecting to database: {e}")
-            return None
+        return f'DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}'
 
 
-    def query_db(self, query):
+    def describe_columns(self) -> list[tuple]:
+        return self.backend.describe()
+
+    def stream_query(self, query, batch_size=None, max_rows=None, max_bytes=None):
         """
-        Executes a query on the MSSQL Server.
+        Executes a query on the backend and yields the result in fetchmany batches.
+        - batch_size: rows per fetchmany call (default DB_FETCH_BATCH_SIZE)
+        - max_rows / max_bytes: caps on the whole result (default DB_MAX_ROWS / DB_MAX_BYTES, 0 disables)
+        Yields {"columns": [...], "rows": [...]}; when a cap is hit the last batch also carries "truncated": True.
+        A query that fails because the connection dropped is retried once on a fresh one.
+        With a guard, the query is rewritten or rejected first and cancelled once it overruns the timeout
+        (QueryRejected / QueryTimeout).
         """
-        conn = self._get_db_connection()
-        columns, rows = [], []
-        if conn is None:
-            return {"columns": columns, "rows": rows}
+        batch_size = batch_size or settings.DB_FETCH_BATCH_SIZE
+        max_rows = settings.DB_MAX_ROWS if max_rows is None else max_rows
+        max_bytes = settings.DB_MAX_BYTES if max_bytes is None else max_bytes
+
+        guard = self.guard
+        timeout = guard.timeout if guard is not None else 0
+        if guard is not None:
+            query = guard.rewrite(query)
+            if guard.max_rows:
+                max_rows = min(max_rows, guard.max_rows) if max_rows else guard.max_rows
+        query = self.backend.prepare(query)
+        for attempt in range(2):
+            started = False
+            watchdog = None
+            try:
+                with self.backend.connection() as conn:
+                    # Set on every checkout, pooled connections keep whatever the previous query left
+                    self.backend.set_timeout(conn, timeout)
+                    if guard is not None:
+                        guard.check_cost(self.backend, conn, query)
+                    with closing(conn.cursor()) as cursor, Watchdog(self.backend, conn, cursor, timeout) as watchdog:
+                        cursor.execute(query)
+                        if not cursor.description:
+                            return
+                        columns = [column[0] for column in cursor.description]
+                        row_count, byte_count = 0, 0
+
+                        while True:
+                            batch = cursor.fetchmany(batch_size)
+                            if not batch:
+                                return
+                            rows, truncated = [], False
+                            for row in batch:
+                                byte_count += sum(_estimate_size(value) for value in row)
+                                if (max_rows and row_count >= max_rows) or (max_bytes and byte_count > max_bytes):
+                                    truncated = True
+                                    break
+                                rows.append(list(row))
+                                row_count += 1
+
+                            started = True
+                            if truncated:
+                                yield {"columns": columns, "rows": rows, "truncated": True}
+                                return
+                            yield {"columns": columns, "rows": rows}
+            except QueryGuardError:
+                raise
+            except Exception as e:
+                if timeout and ((watchdog is not None and watchdog.fired) or self.backend.is_timeout(e)):
+                    raise QueryTimeout(
+                        f"Query cancelled after exceeding the {timeout:g}s timeout. "
+                        "Filter earlier, avoid row-multiplying joins or aggregate before joining."
+                    ) from e
+                if attempt == 0 and not started and self.backend.is_disconnect(e):
+                    continue
+                raise
+
+    def query_db(self, query, max_rows=None, max_bytes=None, orient="rows"):
+        """
+        Executes a query on the backend with bounded, batched fetching.
+        - orient="rows": {"columns", "rows", "truncated"}
+        - orient="columns": {"columns", "data" (one list per column), "row_count", "truncated"}
+        SELECTs are served from the result cache when one is attached.
+        """
+        canonical = canonicalize(query) if self.result_cache is not None else None
+        variant = (orient, max_rows, max_bytes)
+        if canonical is not None:
+            cached = self.result_cache.get(canonical, variant)
+            if cached is not None:
+                return cached
+
+        columns, rows, data, truncated, error = [], [], [], False, None
 
         try:
-            with conn.cursor() as cursor:
-                cursor.execute(query)
-                if cursor.description:
-                    columns = [column[0] for column in cursor.description]
-                    rows = [list(row) for row in cursor.fetchall()]
+            for batch in self.stream_query(query, max_rows=max_rows, max_bytes=max_bytes):
+                if not columns:
+                    columns = batch["columns"]
+                    data = [[] for _ in columns]
+                if orient == "columns":
+                    for values, batch_values in zip(data, zip(*batch["rows"])):
+                        values.extend(batch_values)
+                else:
+                    rows.extend(batch["rows"])
+                truncated = batch.get("truncated", False)
+        except QueryGuardError:
+            # The healer needs to know why the query was stopped
+            raise
         except Exception as e:
             print(f"Error executing query: {e}")
-        finally:
-            conn.close()
-        return {"columns": columns, "rows": rows}
-        
\ No newline at end of file
+            error = str(e)
+            # Rows fetched before the failure are only part of the result
+            truncated = truncated or bool(columns)
+
+        if orient == "columns":
+            row_count = len(data[0]) if data else 0
+            result = {"columns": columns, "data": data, "row_count": row_count, "truncated": truncated}
+        else:
+            result = {"columns": columns, "rows": rows, "truncated": truncated}
+        if error is not None:
+            result["error"] = error
+
+        # A failed fetch must not be served from the cache as the complete result
+        if canonical is not None and error is None:
+            self.result_cache.put(canonical, result, variant)
+        return result
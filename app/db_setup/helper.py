@@ -1,14 +1,25 @@
 import json
 import os
+import sys
 from .db import SQLDB
+from .schema_catalog import get_schema_catalog
+from .setup_graph import SetupUnit, SetupCheckpoint, run_setup_graph
+from .schema_fingerprint import table_fingerprints, diff_fingerprints, load_fingerprints, save_fingerprints
 from itertools import product
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.llm import SchemaChunkerAgent, BusinessLogicChunkerAgent, QnAChunkerAgent
 from src.llm import CategoryGeneratorAgent
 from utils import convert_json_to_toon
+from src.config import settings
 
 db = SQLDB()
 
+QNA_DIFFICULTIES = ["Simple", "Moderate", "Complex"]
+# Per-unit checkpoints of an unfinished setup run, under json_chunks/
+CHECKPOINT_DIR = ".checkpoint"
+# Per-table schema fingerprints of the last complete run, under json_chunks/
+FINGERPRINTS_FILE = "schema_fingerprints.json"
+CHUNK_FILES = ("db", "business_logic", "qna")
+
 def extract_tables():
     tables = db.query_db("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES")
     return [table[0] for table in tables['rows']] if tables['rows'] else []
@@ -51,14 +62,139 @@ def process_qna_generation(diff, biz_logic_ids, schema_context_str, qna_agent):
         f"Business Logic Focus on: {biz_logic_ids_str}"
         f"Difficulty Level: {diff}\n\n"
     )
+    # Errors propagate so the unit is not checkpointed and is retried on the next run
+    qna_response = qna_agent.generate_qna(diff_context)
+    return serialize_pydantic_list(qna_response.chunks)
+
+def select_tables(all_tables, tables=None):
+    """
+    Tables to process: the given names ("all" for every table), or asked for interactively.
+    Returns None when the selection is invalid.
+    """
+    if tables is None:
+        if not sys.stdin.isatty():
+            print("Pass --tables or --all to run setup non-interactively.")
+            return None
+        print("\nAvailable tables in the database:")
+        for i, table in enumerate(all_tables, 1):
+            print(f"{i}. {table}")
+        print("\nEnter a comma-separated list of tables to process, or type 'all' to process all tables.")
+        tables = [t.strip() for t in input("Tables to process: ").split(',') if t.strip()]
+
+    if [t.lower() for t in tables] == ['all']:
+        return all_tables
+    invalid_tables = [t for t in tables if t not in all_tables]
+    if invalid_tables:
+        print(f"Error: The following tables are not in the database: {', '.join(invalid_tables)}")
+        return None
+    return tables
+
+def build_setup_units(schema_context_str, agents, focus_tables=None, focus_context_str=None):
+    """
+    Knowledge-base generation as a dependency graph:
+    db schema chunks and categories start together, each business-logic unit (two categories) starts once the
+    categories exist, and each QnA unit (one difficulty, up to four metrics) once its business-logic unit is done.
+    - focus_tables: only generate chunks for these tables (schema chunks from focus_context_str, their schema alone);
+      the full schema stays in the context so metrics can still join the other tables
+    """
+    schema_agent, business_agent, qna_agent, category_agent = agents
+    focus = f"\n\nFocus ONLY on the tables: {', '.join(focus_tables)}." if focus_tables else ""
+
+    def generate_db():
+        print("  - Generating DB schema chunks...")
+        return serialize_pydantic_list(schema_agent.generate_chunks(focus_context_str or schema_context_str).chunks)
+
+    def generate_categories():
+        print("  - Generating categories...")
+        return list(category_agent.generate_categories(schema_context_str + focus).categories)
+
+    def generate_biz_logic(cat):
+        print(f"  - Generating logic for {cat}...")
+        cat_context = f"{schema_context_str}{focus}\n\nFocus ONLY on metrics for: {cat}."
+        return serialize_pydantic_list(business_agent.generate_business_logic(cat_context).chunks)
+
+    def qna_units(i, biz_chunks):
+        groups = [[b['id'] for b in biz_chunks[j:j + 4]] for j in range(0, len(biz_chunks), 4)]
+        return [
+            SetupUnit(f"qna.{diff.lower()}.{i}.{j}",
+                      lambda diff=diff, ids=ids: process_qna_generation(diff, ids, schema_context_str, qna_agent))
+            for diff, (j, ids) in product(QNA_DIFFICULTIES, enumerate(groups))
+        ]
+
+    def biz_units(categories):
+        pairs = [categories[i : i + 2] for i in range(0, len(categories), 2)]
+        return [
+            SetupUnit(f"business_logic.{i}", lambda cat=cat: generate_biz_logic(cat),
+                      then=lambda chunks, i=i: qna_units(i, chunks))
+            for i, cat in enumerate(pairs)
+        ]
+
+    return [
+        SetupUnit("db", generate_db),
+        SetupUnit("categories", generate_categories, then=biz_units),
+    ]
+
+def assemble_chunks(results):
+    """db, business-logic and QnA chunk lists from the unit results, in a stable order."""
+    biz_count = len(range(0, len(results["categories"]), 2))
+    biz_chunks = [chunk for i in range(biz_count) for chunk in results[f"business_logic.{i}"]]
+    qna_chunks = []
+    for diff in QNA_DIFFICULTIES:
+        for i in range(biz_count):
+            groups = len(range(0, len(results[f"business_logic.{i}"]), 4))
+            for j in range(groups):
+                qna_chunks.extend(results[f"qna.{diff.lower()}.{i}.{j}"])
+    return results["db"], biz_chunks, qna_chunks
+
+def chunk_tables(chunk):
+    """Lower-cased tables a chunk is about: "tables" of business logic, metadata tables/table of QnA and db chunks."""
+    metadata = chunk.get("metadata") or {}
+    tables = chunk.get("tables") or metadata.get("tables") or [metadata.get("table")]
+    return {t.lower() for t in tables if t}
+
+def load_chunk_files(chunk_dir):
+    """The current (db, business_logic, qna) chunk lists, or None when one of the files is missing or unreadable."""
     try:
-        qna_response = qna_agent.generate_qna(diff_context)
-        return serialize_pydantic_list(qna_response.chunks)
-    except Exception as e:
-        print(f"  - Error generating QnA for {diff}: {e}")
-        return []
+        chunks = []
+        for name in CHUNK_FILES:
+            with open(os.path.join(chunk_dir, f"{name}.json"), "r") as f:
+                chunks.append(json.load(f))
+        return tuple(chunks)
+    except (OSError, ValueError):
+        return None
+
+def prune_chunks(existing, tables):
+    """
+    Drop the chunks that mention any of tables from (db, business_logic, qna),
+    along with the QnA chunks of dropped business-logic metrics.
+    """
+    tables = {t.lower() for t in tables}
+    db_chunks, biz_chunks, qna_chunks = ([c for c in chunks if not chunk_tables(c) & tables] for chunks in existing)
+    dropped_ids = {b.get("id") for b in existing[1]} - {b.get("id") for b in biz_chunks}
+    qna_chunks = [q for q in qna_chunks if (q.get("metadata") or {}).get("metric_id") not in dropped_ids]
+    return db_chunks, biz_chunks, qna_chunks
+
+def merge_chunks(kept, generated):
+    """Kept chunks plus the regenerated ones; a regenerated business-logic chunk replaces a kept one with its id."""
+    db_chunks, biz_chunks, qna_chunks = generated
+    new_ids = {b.get("id") for b in biz_chunks}
+    return (
+        kept[0] + db_chunks,
+        [b for b in kept[1] if b.get("id") not in new_ids] + biz_chunks,
+        kept[2] + qna_chunks,
+    )
 
-def setup():
+def setup(tables=None, workers=None, fresh=False, full=False):
+    """
+    Generate the knowledge-base chunks (db, business_logic, qna) for the selected tables into json_chunks/.
+    Tables are fingerprinted on every run; when the chunk files of an earlier run exist, only the chunks of added,
+    changed or dropped tables are regenerated or removed and the rest is kept.
+    - tables: table names, ["all"] for every table, None to ask interactively
+    - workers: LLM calls run at once (default SETUP_WORKERS)
+    - fresh: discard the checkpoints of an interrupted run instead of resuming it
+    - full: regenerate every chunk even when the schema fingerprints match
+    Returns True when every chunk file was written (or was already up to date).
+    """
     print("Initializing Database Setup with LLM Chunk Generation...")
     create_metadata_table()
 
@@ -66,105 +202,89 @@ def setup():
     all_tables = extract_tables()
     if not all_tables:
         print("No tables found in the database. Ensure your connection is correct and database is populated.")
-        return
-
-    print("\nAvailable tables in the database:")
-    for i, table in enumerate(all_tables, 1):
-        print(f"{i}. {table}")
+        return False
 
     # 2. Select the tables want to use for proceed or all
-    print("\nEnter a comma-separated list of tables to process, or type 'all' to process all tables.")
-    user_input = input("Tables to process: ").strip()
-
-    if user_input.lower() == 'all':
-        selected_tables = all_tables
-    else:
-        selected_tables = [t.strip() for t in user_input.split(',')]
-        invalid_tables = [t for t in selected_tables if t not in all_tables]
-        if invalid_tables:
-            print(f"Error: The following tables are not in the database: {', '.join(invalid_tables)}")
-            return
-
+    selected_tables = select_tables(all_tables, tables)
     if not selected_tables:
         print("No tables selected. Exiting.")
-        return
+        return False
 
     print(f"\nProceeding with {len(selected_tables)} table(s): {', '.join(selected_tables)}")
 
     # 3. Proceed selected Tables.
     schema = extract_schema(selected_tables)
+    # Setup may have changed the schema; rebuild the catalog the pipeline validates SQL against
+    get_schema_catalog(db, refresh=True)
 
-    if schema['rows']:
-        # Group schema by table for toon compression
-        schema_dict = {}
-        for row in schema['rows']:
-            _sch, table_name, column_name, data_type = row
-            if table_name not in schema_dict:
-                schema_dict[table_name] = {}
-            schema_dict[table_name][column_name] = data_type
-
-        schema_context_str = convert_json_to_toon(schema_dict)
-
-        print("\nUsing LLM to generate chunks...")
-
-        chunk_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'json_chunks')
-
-        # Generator Agents
-        schema_agent = SchemaChunkerAgent()
-        business_agent = BusinessLogicChunkerAgent()
-        qna_agent = QnAChunkerAgent()
-        category_agent = CategoryGeneratorAgent()
-
-        print("1. Generating DB Schema Chunks...")
-        db_response = schema_agent.generate_chunks(schema_context_str)
-        db_chunks = serialize_pydantic_list(db_response.chunks)
-        save_json(db_chunks, os.path.join(chunk_dir, 'db.json'))
-        
-        print("2. Generate Categories...")
-        categories = category_agent.generate_categories(schema_context_str)
-        categories = categories.categories
-
-        print("3. Generating Business Logic Chunks...")
-
-        biz_chunks = []
-        # Assuming 'categories' is your list
-        tri_cat_chunks = [categories[i : i + 2] for i in range(0, len(categories), 2)]
-        
-        def process_biz_logic(cat):
-            print(f"  - Generating logic for {cat}...")
-            cat_context = f"{schema_context_str}\n\nFocus ONLY on metrics for: {cat}."
-            biz_response = business_agent.generate_business_logic(cat_context)
-            return serialize_pydantic_list(biz_response.chunks)
-
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            biz_futures = {executor.submit(process_biz_logic, cat): cat for cat in tri_cat_chunks}
-            for future in as_completed(biz_futures):
-                cat = biz_futures[future]
-                try:
-                    biz_chunks.extend(future.result())
-                except Exception as e:
-                    print(f"  - Error generating for {cat}: {e}")
-
-        save_json(biz_chunks, os.path.join(chunk_dir, 'business_logic.json'))
-
-        print("4. Generating QnA Chunks...")
-
-        qna_difficulties = ["Simple", "Moderate", "Complex"]
-        tri_biz_logic_chunks = [[b['id'] for b in biz_chunks[i:i+4]] for i in range(0, len(biz_chunks), 4)]
-        
-        qna_chunks = []
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            futures = []
-            for diff, biz_logic_ids in product(qna_difficulties, tri_biz_logic_chunks):
-                futures.append(executor.submit(process_qna_generation, diff, biz_logic_ids, schema_context_str, qna_agent))
-            
-            for future in as_completed(futures):
-                qna_chunks.extend(future.result())
-
-        save_json(qna_chunks, os.path.join(chunk_dir, 'qna.json'))
-
-        print(f"\nAll chunks generated successfully! (Biz: {len(biz_chunks)}, QnA: {len(qna_chunks)})")
-    else:
+    if not schema['rows']:
         print("No schema details found for the selected tables.")
+        return False
+
+    # Group schema by table for toon compression
+    schema_dict = {}
+    for row in schema['rows']:
+        _sch, table_name, column_name, data_type = row
+        if table_name not in schema_dict:
+            schema_dict[table_name] = {}
+        schema_dict[table_name][column_name] = data_type
+
+    schema_context_str = convert_json_to_toon(schema_dict)
+
+    chunk_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'json_chunks')
+    fingerprints = table_fingerprints(schema['rows'])
+    fingerprint_path = os.path.join(chunk_dir, FINGERPRINTS_FILE)
+    previous = {} if full else load_fingerprints(fingerprint_path)
+    existing = load_chunk_files(chunk_dir) if previous else None
+
+    # Without fingerprints and chunk files of an earlier run, everything is generated
+    focus_tables, focus_context_str, kept = None, None, None
+    if existing is not None:
+        # Tables left out of this selection keep their chunks; only a table gone from the database counts as dropped
+        in_db = set(all_tables)
+        scope = {t: fp for t, fp in previous.items() if t in fingerprints or t not in in_db}
+        added, changed, dropped = diff_fingerprints(scope, fingerprints)
+        fingerprints = {**{t: fp for t, fp in previous.items() if t not in dropped}, **fingerprints}
+        if not (added or changed or dropped):
+            print("\nSchema unchanged since the last setup run, nothing to regenerate (use --full to regenerate anyway).")
+            return True
+        print(f"\nSchema changes - added: {', '.join(added) or '-'}, changed: {', '.join(changed) or '-'}, "
+              f"dropped: {', '.join(dropped) or '-'}")
+        kept = prune_chunks(existing, added + changed + dropped)
+        focus_tables = added + changed
+        focus_context_str = convert_json_to_toon({t: schema_dict[t] for t in focus_tables})
+
+    if focus_tables == []:
+        # Only dropped tables: their chunks are removed, nothing to generate
+        db_chunks, biz_chunks, qna_chunks = kept
+    else:
+        # Checkpoints belong to one schema context and focus; a different selection or schema starts over
+        checkpoint = SetupCheckpoint(
+            os.path.join(chunk_dir, CHECKPOINT_DIR),
+            SetupCheckpoint.fingerprint_of(schema_context_str, *(focus_tables or [])),
+            fresh=fresh,
+        )
 
-
+        print("\nUsing LLM to generate chunks...")
+        agents = (SchemaChunkerAgent(), BusinessLogicChunkerAgent(), QnAChunkerAgent(), CategoryGeneratorAgent())
+        results, failed = run_setup_graph(
+            build_setup_units(schema_context_str, agents, focus_tables, focus_context_str),
+            checkpoint,
+            workers or settings.SETUP_WORKERS,
+        )
+        if failed:
+            print(f"\n{len(failed)} unit(s) failed: {', '.join(failed)}. Run setup again to resume from the checkpoint.")
+            return False
+
+        db_chunks, biz_chunks, qna_chunks = assemble_chunks(results)
+        if kept is not None:
+            db_chunks, biz_chunks, qna_chunks = merge_chunks(kept, (db_chunks, biz_chunks, qna_chunks))
+        checkpoint.clear()
+
+    save_json(db_chunks, os.path.join(chunk_dir, 'db.json'))
+    save_json(biz_chunks, os.path.join(chunk_dir, 'business_logic.json'))
+    save_json(qna_chunks, os.path.join(chunk_dir, 'qna.json'))
+    save_fingerprints(fingerprint_path, fingerprints)
+
+    print(f"\nAll chunks generated successfully! (Biz: {len(biz_chunks)}, QnA: {len(qna_chunks)})")
+    return True
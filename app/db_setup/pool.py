@@ -0,0 +1,172 @@
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+class _PooledConnection:
+    def __init__(self, conn: Any):
+        self.conn = conn
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+    - connect: factory that opens a new connection (raises on failure)
+    - min_size: connections kept open even when idle
+    - max_size: hard cap on open connections, checkouts block beyond it
+    - idle_timeout: seconds after which idle connections above min_size are closed
+    - health_check_interval: connections idle for longer are pinged on checkout
+    - checkout_timeout: seconds to wait for a free connection
+    - is_disconnect: tells whether an exception means the connection is dead
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        idle_timeout: float = 300,
+        health_check_interval: float = 30,
+        checkout_timeout: float = 30,
+        is_disconnect: Optional[Callable[[Exception], bool]] = None,
+    ):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        self._is_disconnect = is_disconnect or (lambda e: False)
+        self._idle: deque[_PooledConnection] = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def warm_up(self):
+        """Open connections until min_size are available."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                pooled = _PooledConnection(self._connect())
+            except Exception:
+                self._release_slot()
+                raise
+            self.release(pooled)
+
+    def acquire(self) -> _PooledConnection:
+        deadline = time.monotonic() + self.checkout_timeout
+        pooled = None
+        expired = []
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                expired.extend(self._evict_idle_locked())
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No free connection after {self.checkout_timeout}s (max_size={self.max_size})")
+                self._cond.wait(remaining)
+        for stale in expired:
+            self._close_quietly(stale)
+
+        if pooled is not None and not self._is_healthy(pooled):
+            # Keep the slot, replace the dead connection
+            self._close_quietly(pooled)
+            pooled = None
+
+        if pooled is None:
+            try:
+                pooled = _PooledConnection(self._connect())
+            except Exception:
+                self._release_slot()
+                raise
+        return pooled
+
+    def release(self, pooled: _PooledConnection, broken: bool = False):
+        if broken or self._closed:
+            self._close_quietly(pooled)
+            self._release_slot()
+            return
+        pooled.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection, returning it to the pool (or discarding it if it died) afterwards."""
+        pooled = self.acquire()
+        broken = False
+        try:
+            yield pooled.conn
+        except Exception as e:
+            broken = self._is_disconnect(e)
+            raise
+        finally:
+            self.release(pooled, broken=broken)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close_quietly(pooled)
+
+    def _evict_idle_locked(self) -> list[_PooledConnection]:
+        """Pop idle connections past idle_timeout, keeping min_size open. Caller closes them."""
+        expired = []
+        now = time.monotonic()
+        # Oldest idle connections sit at the left end
+        while self._idle and self._size > self.min_size and now - self._idle[0].last_used > self.idle_timeout:
+            expired.append(self._idle.popleft())
+            self._size -= 1
+        return expired
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        if time.monotonic() - pooled.last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = pooled.conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception as e:
+            logging.warning(f"Dropping unhealthy pooled connection: {e}")
+            return False
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,134 @@
+import logging
+import threading
+from typing import Optional
+import sqlglot
+import sqlglot.errors
+from sqlglot import exp
+from src.config import settings
+
+
+class QueryGuardError(Exception):
+    """A generated query stopped by the execution guard; the message is meant for the self-healer."""
+
+
+class QueryRejected(QueryGuardError):
+    pass
+
+
+class QueryTimeout(QueryGuardError):
+    pass
+
+
+def _cap_literal(node: exp.Expression, key: str, cap: int) -> bool:
+    """Lower an integer literal row count to cap. False when the count isn't a plain literal."""
+    value = node.args.get(key)
+    if not isinstance(value, exp.Literal) or value.is_string:
+        return False
+    if int(value.this) > cap:
+        node.set(key, exp.Literal.number(cap))
+    return True
+
+
+class QueryGuard:
+    """
+    Execution guard for generated SQL.
+    - max_rows: row cap enforced with TOP (0 leaves the row count alone)
+    - timeout: seconds a query may run, fetching included, before it is cancelled (0 disables)
+    - max_cost: estimated plan cost above which a query is refused before it runs (0 skips the estimate)
+    """
+
+    def __init__(self, max_rows: int = 10000, timeout: float = 30, max_cost: float = 0):
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.max_cost = max_cost
+
+    def rewrite(self, sql: str) -> str:
+        """Reject anything but a single read-only query, then add or cap its TOP. Returns the T-SQL to run."""
+        try:
+            statements = [s for s in sqlglot.parse(sql, read="tsql") if s is not None]
+        except sqlglot.errors.SqlglotError as e:
+            raise QueryRejected(f"Query rejected: it could not be parsed as a single SELECT ({e}).") from e
+        if len(statements) != 1:
+            raise QueryRejected("Query rejected: exactly one SELECT statement is allowed per query.")
+        tree = statements[0]
+        if not isinstance(tree, exp.Query):
+            raise QueryRejected(f"Query rejected: only SELECT statements may run, got {tree.key.upper()}.")
+        if tree.find(exp.Into):
+            raise QueryRejected("Query rejected: SELECT ... INTO writes a table; return the rows instead.")
+        if tree.find(exp.DML, exp.DDL):
+            raise QueryRejected("Query rejected: data-modifying statements are not allowed.")
+
+        if not self.max_rows:
+            return sql
+        # One row over the cap so the fetch can still flag the result as truncated
+        cap = self.max_rows + 1
+        limit = tree.args.get("limit")
+        if limit is None:
+            return tree.limit(cap, copy=False).sql(dialect="tsql")
+        options = limit.args.get("limit_options")
+        if options is not None and options.args.get("percent"):
+            return sql
+        key = "count" if isinstance(limit, exp.Fetch) else "expression"
+        before = limit.args.get(key)
+        if _cap_literal(limit, key, cap) and limit.args.get(key) is not before:
+            return tree.sql(dialect="tsql")
+        return sql
+
+    def check_cost(self, backend, conn, query: str):
+        if not self.max_cost:
+            return
+        cost = backend.estimate_cost(conn, query)
+        if cost is not None and cost > self.max_cost:
+            raise QueryRejected(
+                f"Query rejected: estimated cost {cost:.1f} exceeds the limit of {self.max_cost:g}. "
+                "Filter earlier, avoid row-multiplying joins or aggregate before joining."
+            )
+
+
+class Watchdog:
+    """Cancels the running statement through backend.cancel once timeout seconds have passed."""
+
+    def __init__(self, backend, conn, cursor, timeout: float):
+        self.fired = False
+        self._timer: Optional[threading.Timer] = None
+        if timeout:
+            self._timer = threading.Timer(timeout, self._fire, args=(backend, conn, cursor))
+            self._timer.daemon = True
+
+    def _fire(self, backend, conn, cursor):
+        self.fired = True
+        try:
+            backend.cancel(conn, cursor)
+        except Exception as e:
+            logging.error(f"Failed to cancel overrunning query: {e}")
+
+    def __enter__(self):
+        if self._timer is not None:
+            self._timer.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._timer is not None:
+            self._timer.cancel()
+            # A cancel already in progress must finish before the connection goes back to the pool
+            self._timer.join()
+        return False
+
+
+_shared_guard: Optional[QueryGuard] = None
+_shared_lock = threading.Lock()
+
+def get_query_guard() -> Optional[QueryGuard]:
+    """Process-wide guard for generated queries, or None when QUERY_GUARD_ENABLED is off."""
+    global _shared_guard
+    if not settings.QUERY_GUARD_ENABLED:
+        return None
+    if _shared_guard is None:
+        with _shared_lock:
+            if _shared_guard is None:
+                _shared_guard = QueryGuard(
+                    max_rows=settings.DB_MAX_ROWS,
+                    timeout=settings.QUERY_TIMEOUT,
+                    max_cost=settings.QUERY_MAX_COST,
+                )
+    return _shared_guard
@@ -0,0 +1,247 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+import sqlglot
+import sqlglot.errors
+from sqlglot import exp
+from src.config import settings
+from src.metrics import REGISTRY
+
+
+class CanonicalQuery:
+    """
+    Canonical form of a SELECT used as a cache key.
+    - key: normalized SQL with table aliases resolved and (when safe) projections sorted and unaliased
+    - projections: canonical SQL of each output column in the query's own order (None when not tracked)
+    - names: output column names of the query
+    - tables: lower-cased base tables the query reads
+    """
+
+    def __init__(self, key: str, projections: Optional[list[str]], names: list[str], tables: set[str]):
+        self.key = key
+        self.projections = projections
+        self.names = names
+        self.tables = tables
+
+
+def _resolve_table_aliases(tree: exp.Expression):
+    """Replace table aliases with the table name (suffixed on self-joins) so alias choice doesn't change the key."""
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    renames, seen = {}, {}
+    for table in tree.find_all(exp.Table):
+        alias = table.alias
+        if not alias or table.name.lower() in cte_names:
+            continue
+        if alias.lower() in renames:
+            # Same alias bound twice in different scopes, leave the query as written
+            return
+        base = table.name.lower()
+        seen[base] = seen.get(base, 0) + 1
+        renames[alias.lower()] = base if seen[base] == 1 else f"{base}_{seen[base]}"
+
+    if not renames:
+        return
+    for table in tree.find_all(exp.Table):
+        if table.alias and table.alias.lower() in renames:
+            table.set("alias", exp.TableAlias(this=exp.to_identifier(renames[table.alias.lower()])))
+    for column in tree.find_all(exp.Column):
+        if column.table and column.table.lower() in renames:
+            column.set("table", exp.to_identifier(renames[column.table.lower()]))
+
+
+def _has_ordinals(tree: exp.Select) -> bool:
+    """True when ORDER BY or GROUP BY refers to a projection by position (ORDER BY 1)."""
+    keys = []
+    if tree.args.get("order") is not None:
+        keys += [o.this for o in tree.args["order"].expressions]
+    if tree.args.get("group") is not None:
+        keys += tree.args["group"].expressions
+    return any(isinstance(k, exp.Literal) and not k.is_string for k in keys)
+
+
+def canonicalize(sql: str) -> Optional[CanonicalQuery]:
+    """Parse a T-SQL query and build its canonical form, or None when it isn't a cacheable read."""
+    try:
+        tree = sqlglot.parse_one(sql, read="tsql")
+    except sqlglot.errors.SqlglotError:
+        return None
+    if not isinstance(tree, exp.Query) or tree.find(exp.Into):
+        return None
+
+    tables = {
+        table.name.lower() for table in tree.find_all(exp.Table)
+    } - {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+
+    _resolve_table_aliases(tree)
+
+    projections, names = None, []
+    if isinstance(tree, exp.Select):
+        selects = tree.selects
+        names = [p.alias_or_name for p in selects]
+        if not any(p.unalias().is_star for p in selects):
+            aliases = {p.alias.lower(): p.unalias() for p in selects if p.alias}
+            # ORDER BY may reference projection aliases, inline the expression before dropping aliases
+            order = tree.args.get("order")
+            if order is not None and aliases:
+                for column in list(order.find_all(exp.Column)):
+                    if not column.table and column.name.lower() in aliases:
+                        column.replace(aliases[column.name.lower()].copy())
+            unaliased = [p.unalias().copy() for p in selects]
+            projections = [p.sql(dialect="tsql", normalize=True) for p in unaliased]
+            # Positional ORDER BY / GROUP BY depend on the projection order, so those keep it
+            if len(set(projections)) == len(projections) and not _has_ordinals(tree):
+                tree.set("expressions", [unaliased[i] for i in sorted(range(len(unaliased)), key=projections.__getitem__)])
+            else:
+                projections = None
+
+    key = tree.sql(dialect="tsql", normalize=True, normalize_functions="upper")
+    return CanonicalQuery(key, projections, names, tables)
+
+
+def _result_bytes(result: dict) -> int:
+    size = 64
+    for values in result.get("rows") or result.get("data") or []:
+        for value in values:
+            size += len(value) if isinstance(value, (str, bytes)) else 8
+    return size
+
+
+class SQLResultCache:
+    """
+    In-memory cache of query results keyed by the canonical sqlglot form of the query.
+    - default_ttl: seconds a result stays valid
+    - table_ttls: per-table TTL overrides, a query uses the smallest TTL of the tables it reads
+    - max_bytes: approximate memory cap, least recently used results are evicted first
+    """
+
+    def __init__(self, default_ttl: float = 3600, table_ttls: Optional[dict[str, float]] = None, max_bytes: int = 64 * 1024 * 1024):
+        self.default_ttl = default_ttl
+        self.table_ttls = {k.lower(): v for k, v in (table_ttls or {}).items()}
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, dict] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _ttl_for(self, tables: set[str]) -> float:
+        ttls = [self.table_ttls.get(t, self.default_ttl) for t in tables]
+        return min(ttls) if ttls else self.default_ttl
+
+    def get(self, canonical: CanonicalQuery, variant: tuple = ()) -> Optional[dict]:
+        cache_key = (canonical.key, *variant)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and time.monotonic() > entry["expires_at"]:
+                self._remove_locked(cache_key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+        return self._project(entry, canonical)
+
+    def put(self, canonical: CanonicalQuery, result: dict, variant: tuple = ()):
+        if not result.get("columns"):
+            return
+        cache_key = (canonical.key, *variant)
+        size = _result_bytes(result)
+        if size > self.max_bytes:
+            return
+        entry = {
+            "result": dict(result),
+            "projections": canonical.projections,
+            "size": size,
+            "tables": canonical.tables,
+            "expires_at": time.monotonic() + self._ttl_for(canonical.tables),
+        }
+        with self._lock:
+            if cache_key in self._entries:
+                self._remove_locked(cache_key)
+            self._entries[cache_key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove_locked(next(iter(self._entries)))
+                self.evictions += 1
+
+    @staticmethod
+    def _project(entry: dict, canonical: CanonicalQuery) -> dict:
+        """Reorder and rename the stored columns to match the requesting query."""
+        result = dict(entry["result"])
+        stored, wanted = entry["projections"], canonical.projections
+        if not stored or not wanted or stored == wanted:
+            if canonical.names and len(canonical.names) == len(result["columns"]):
+                result["columns"] = list(canonical.names)
+            return result
+
+        order = [stored.index(p) for p in wanted]
+        result["columns"] = list(canonical.names)
+        if "rows" in result:
+            result["rows"] = [[row[i] for i in order] for row in result["rows"]]
+        if "data" in result:
+            result["data"] = [result["data"][i] for i in order]
+        return result
+
+    def invalidate(self, table: Optional[str] = None) -> int:
+        """Drop every cached result, or only results that read the given table."""
+        with self._lock:
+            if table is None:
+                keys = list(self._entries)
+            else:
+                keys = [k for k, e in self._entries.items() if table.lower() in e["tables"]]
+            for key in keys:
+                self._remove_locked(key)
+            return len(keys)
+
+    def _remove_locked(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry["size"]
+
+    def render_metrics(self) -> list[str]:
+        stats = self.stats()
+        return [
+            "# TYPE sqlwise_sql_cache_hits_total counter",
+            f"sqlwise_sql_cache_hits_total {stats['hits']}",
+            "# TYPE sqlwise_sql_cache_misses_total counter",
+            f"sqlwise_sql_cache_misses_total {stats['misses']}",
+            "# TYPE sqlwise_sql_cache_evictions_total counter",
+            f"sqlwise_sql_cache_evictions_total {stats['evictions']}",
+            "# TYPE sqlwise_sql_cache_bytes gauge",
+            f"sqlwise_sql_cache_bytes {stats['bytes']}",
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+_shared_cache: Optional[SQLResultCache] = None
+_shared_lock = threading.Lock()
+
+def get_result_cache() -> Optional[SQLResultCache]:
+    """Process-wide SQL result cache, or None when SQL_CACHE_ENABLED is off."""
+    global _shared_cache
+    if not settings.SQL_CACHE_ENABLED:
+        return None
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = SQLResultCache(
+                    default_ttl=settings.SQL_CACHE_TTL,
+                    table_ttls=settings.SQL_CACHE_TABLE_TTLS,
+                    max_bytes=settings.SQL_CACHE_MAX_BYTES,
+                )
+                REGISTRY.register_collector(_shared_cache.render_metrics)
+                logging.info("SQL result cache enabled.")
+    return _shared_cache
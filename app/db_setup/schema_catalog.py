@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import difflib
+import logging
+import threading
+from typing import Optional
+import sqlglot
+import sqlglot.errors
+from sqlglot import exp
+from sqlglot.optimizer.qualify import qualify
+from sqlglot.schema import MappingSchema
+from src.config import settings
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tables a query may read without them being in the catalog
+_SYSTEM_SCHEMAS = {"information_schema", "sys"}
+
+
+def _data_type(value: str) -> str:
+    try:
+        exp.DataType.build(value, dialect="tsql")
+        return value
+    except Exception:
+        return "UNKNOWN"
+
+
+class SchemaCatalog:
+    """
+    Local copy of the database's tables and columns, used to check generated SQL without a round-trip.
+    - tables: {table: {column: data type}}
+    """
+
+    def __init__(self, tables: dict[str, dict[str, str]]):
+        self.tables = tables
+        self._names = {name.lower(): name for name in tables}
+        self._schema = MappingSchema(
+            {table: {column: _data_type(t) for column, t in columns.items()} for table, columns in tables.items()},
+            dialect="tsql",
+        )
+
+    @classmethod
+    def from_columns(cls, rows: list[tuple]) -> "SchemaCatalog":
+        """Build from (schema, table, column, data type) rows, e.g. INFORMATION_SCHEMA.COLUMNS."""
+        tables: dict[str, dict[str, str]] = {}
+        for _schema, table, column, data_type in rows:
+            tables.setdefault(table, {})[column] = str(data_type)
+        return cls(tables)
+
+    @classmethod
+    def load(cls, path: str) -> "SchemaCatalog":
+        with open(path, "r") as f:
+            return cls(json.load(f)["tables"])
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"created_at": time.time(), "tables": self.tables}, f, indent=2)
+
+    def _columns_of(self, table: str) -> dict[str, str]:
+        return self.tables.get(self._names.get(table.lower(), ""), {})
+
+    def validate(self, sql: str) -> Optional[str]:
+        """
+        Resolve every table and column of the query against the catalog.
+        Returns a precise error (unknown table/column with suggestions, ambiguous column), or None when the
+        query resolves or uses something the check can't judge (it never blocks a query on a sqlglot limitation).
+        """
+        try:
+            tree = sqlglot.parse_one(sql, read="tsql")
+        except sqlglot.errors.SqlglotError:
+            # Syntax is check_sql_syntax's job
+            return None
+        if not isinstance(tree, exp.Query) or tree.find(exp.Into):
+            return None
+
+        cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+        query_tables, opaque = [], False
+        for table in tree.find_all(exp.Table):
+            name = table.name
+            if not name or name.lower() in cte_names:
+                continue
+            identifier = table.this
+            if table.db.lower() in _SYSTEM_SCHEMAS or (
+                isinstance(identifier, exp.Identifier) and (identifier.args.get("temporary") or identifier.args.get("global_"))
+            ):
+                # Columns of system and temp tables are unknown to the catalog
+                opaque = True
+                continue
+            if name.lower() not in self._names:
+                suggestions = difflib.get_close_matches(name.lower(), list(self._names), n=3)
+                hint = f" Did you mean: {', '.join(self._names[s] for s in suggestions)}?" if suggestions else ""
+                return f"Unknown table '{name}'.{hint} Available tables: {', '.join(self.tables)}."
+            query_tables.append(self._names[name.lower()])
+
+        if opaque:
+            return None
+        try:
+            qualify(tree, schema=self._schema, dialect="tsql", validate_qualify_columns=True)
+        except sqlglot.errors.OptimizeError as e:
+            return self._explain(str(e), query_tables)
+        except Exception:
+            return None
+        return None
+
+    def _explain(self, message: str, query_tables: list[str]) -> Optional[str]:
+        column = None
+        for marker in ("Column '", "Unknown column: "):
+            if marker in message:
+                column = message.split(marker, 1)[1].split("'", 1)[0].split()[0].strip("'.,")
+                break
+        if not column:
+            return None
+
+        owners = [t for t in dict.fromkeys(query_tables) if column.lower() in {c.lower() for c in self._columns_of(t)}]
+        if len(owners) > 1:
+            return f"Ambiguous column '{column}': it exists in {', '.join(owners)}. Qualify it with a table alias."
+
+        candidates = {c: t for t in dict.fromkeys(query_tables) for c in self._columns_of(t)}
+        suggestions = difflib.get_close_matches(column.lower(), [c.lower() for c in candidates], n=3)
+        by_lower = {c.lower(): c for c in candidates}
+        hint = ""
+        if suggestions:
+            hint = " Did you mean " + ", ".join(f"{candidates[by_lower[s]]}.{by_lower[s]}" for s in suggestions) + "?"
+        if owners:
+            return f"Column '{column}' does not belong to the table it is qualified with; it exists in {owners[0]}.{hint}"
+        return f"Unknown column '{column}'.{hint}"
+
+
+def _catalog_path() -> str:
+    return settings.SCHEMA_CATALOG_PATH or os.path.join(APP_DIR, ".cache", f"schema_catalog_{settings.DB_BACKEND}.json")
+
+
+_shared_catalog: Optional[SchemaCatalog] = None
+_shared_lock = threading.Lock()
+_failed_at = 0.0
+# Seconds to wait before retrying a catalog build that failed (e.g. database unreachable)
+_RETRY_AFTER = 60
+
+
+def get_schema_catalog(db=None, refresh: bool = False) -> Optional[SchemaCatalog]:
+    """
+    Process-wide catalog. Loaded from SCHEMA_CATALOG_PATH while it is younger than SCHEMA_CATALOG_TTL,
+    otherwise rebuilt from the database and saved. None when disabled or the database can't be described.
+    """
+    global _shared_catalog, _failed_at
+    if not settings.SCHEMA_CATALOG_ENABLED:
+        return None
+    if _shared_catalog is not None and not refresh:
+        return _shared_catalog
+    with _shared_lock:
+        if _shared_catalog is not None and not refresh:
+            return _shared_catalog
+        if not refresh and _failed_at and time.monotonic() - _failed_at < _RETRY_AFTER:
+            return None
+
+        path = _catalog_path()
+        ttl = settings.SCHEMA_CATALOG_TTL
+        if not refresh and os.path.exists(path) and (not ttl or time.time() - os.path.getmtime(path) < ttl):
+            try:
+                _shared_catalog = SchemaCatalog.load(path)
+                return _shared_catalog
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable schema catalog {path}: {e}")
+
+        try:
+            if db is None:
+                from .db import SQLDB
+                db = SQLDB()
+            catalog = SchemaCatalog.from_columns(db.describe_columns())
+            catalog.save(path)
+            _shared_catalog = catalog
+            logging.info(f"Schema catalog built with {len(catalog.tables)} tables.")
+        except Exception as e:
+            logging.error(f"Schema catalog unavailable: {e}")
+            _failed_at = time.monotonic()
+            return None
+    return _shared_catalog
@@ -0,0 +1,44 @@
+import os
+import json
+import hashlib
+import logging
+
+
+def table_fingerprints(rows) -> dict[str, str]:
+    """
+    One hash per table over its (column, data type) pairs, from INFORMATION_SCHEMA.COLUMNS rows
+    (schema, table, column, data type). Column order doesn't matter; a renamed, added, dropped or retyped column does.
+    """
+    columns: dict[str, list] = {}
+    for _schema, table, column, data_type in rows:
+        columns.setdefault(table, []).append(f"{column}\x00{data_type}")
+    return {
+        table: hashlib.sha256("\n".join(sorted(pairs)).encode("utf-8")).hexdigest()
+        for table, pairs in columns.items()
+    }
+
+
+def diff_fingerprints(old: dict[str, str], new: dict[str, str]) -> tuple[list[str], list[str], list[str]]:
+    """(added, changed, dropped) tables between two fingerprint sets."""
+    added = sorted(t for t in new if t not in old)
+    changed = sorted(t for t in new if t in old and old[t] != new[t])
+    dropped = sorted(t for t in old if t not in new)
+    return added, changed, dropped
+
+
+def load_fingerprints(path: str) -> dict[str, str]:
+    """Fingerprints saved by the last complete setup run, empty when there are none."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)["tables"]
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Ignoring unreadable schema fingerprints {path}: {e}")
+        return {}
+
+
+def save_fingerprints(path: str, fingerprints: dict[str, str]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"tables": dict(sorted(fingerprints.items()))}, f, indent=2)
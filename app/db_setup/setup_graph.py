@@ -0,0 +1,120 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from typing import Any, Callable, Iterable, List, Optional
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class SetupUnit:
+    """
+    One checkpointed step of knowledge-base generation.
+    - unit_id: stable name, also the checkpoint file name
+    - run: produces the unit's JSON-serializable result
+    - then: builds the follow-up units from the result (units that depend on this one)
+    """
+
+    def __init__(self, unit_id: str, run: Callable[[], Any], then: Optional[Callable[[Any], Iterable["SetupUnit"]]] = None):
+        self.unit_id = unit_id
+        self.run = run
+        self.then = then
+
+
+class SetupCheckpoint:
+    """
+    Finished units of one setup run, one JSON file per unit under directory.
+    The run is identified by a fingerprint of its inputs; checkpoints of a different run are discarded,
+    and so are all of them with fresh.
+    """
+
+    def __init__(self, directory: str, fingerprint: str, fresh: bool = False):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+        manifest = self._read(os.path.join(directory, "manifest.json"))
+        if fresh or manifest is None or manifest.get("fingerprint") != fingerprint:
+            self.clear()
+            os.makedirs(directory, exist_ok=True)
+            self._write(os.path.join(directory, "manifest.json"), {"fingerprint": fingerprint})
+
+    @staticmethod
+    def fingerprint_of(*parts: str) -> str:
+        return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _read(path: str) -> Optional[dict]:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write(path: str, data: dict):
+        # Write then rename, so an interrupted run never leaves a half-written checkpoint behind
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def _path(self, unit_id: str) -> str:
+        return os.path.join(self.directory, f"{unit_id}.json")
+
+    def load(self, unit_id: str) -> Optional[dict]:
+        """{"result": ...} for a finished unit, else None."""
+        return self._read(self._path(unit_id))
+
+    def save(self, unit_id: str, result: Any):
+        with self._lock:
+            self._write(self._path(unit_id), {"result": result})
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def run_setup_graph(units: Iterable[SetupUnit], checkpoint: SetupCheckpoint, workers: int = 3) -> tuple[dict, List[str]]:
+    """
+    Run units as soon as the unit they depend on has finished, up to workers at a time.
+    Units with a checkpoint are not run again. A failed unit is not checkpointed and its dependents are skipped,
+    so the next run resumes from there.
+    Returns ({unit_id: result}, [failed unit ids]).
+    """
+    results: dict = {}
+    failed: List[str] = []
+    pending: dict = {}
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+
+        def complete(unit: SetupUnit, result: Any):
+            results[unit.unit_id] = result
+            if unit.then is not None:
+                for child in unit.then(result):
+                    schedule(child)
+
+        def schedule(unit: SetupUnit):
+            saved = checkpoint.load(unit.unit_id)
+            if saved is not None:
+                print(f"  - {unit.unit_id}: resumed from checkpoint")
+                complete(unit, saved["result"])
+            else:
+                pending[executor.submit(unit.run)] = unit
+
+        for unit in units:
+            schedule(unit)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                unit = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"  - {unit.unit_id} failed: {e}")
+                    failed.append(unit.unit_id)
+                    continue
+                checkpoint.save(unit.unit_id, result)
+                print(f"  - {unit.unit_id}: done")
+                complete(unit, result)
+
+    return results, failed
@@ -0,0 +1,327 @@
+import os
+import csv
+import sqlite3
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+import calendar
+from datetime import date, datetime, timedelta
+from typing import Optional
+import sqlglot
+from sqlglot import exp
+from src.config import settings
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV_DIR = os.path.join(os.path.dirname(APP_DIR), "files")
+
+# orders.csv / refunds.csv store timestamps like 3/19/12 10:42
+_TIMESTAMP_FORMATS = ("%m/%d/%y %H:%M", "%m/%d/%Y %H:%M", "%Y-%m-%d %H:%M:%S")
+
+
+def _convert(value: str):
+    """CSV cell to a SQLite value: numbers stay numeric, timestamps become ISO strings, blanks become NULL."""
+    if value == "":
+        return None
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    for fmt in _TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    return value
+
+
+# ─── T-SQL date functions ─────────────────────────────────────────
+# SQLite has no date arithmetic beyond date()/julianday() modifiers, and those reject units like QUARTER,
+# so DATEADD / DATEDIFF / DATEPART are rewritten into calls to the Python functions below.
+
+_UNIT_ALIASES = {
+    "YY": "YEAR", "YYYY": "YEAR", "QQ": "QUARTER", "Q": "QUARTER", "MM": "MONTH", "M": "MONTH",
+    "DY": "DAYOFYEAR", "Y": "DAYOFYEAR", "DD": "DAY", "D": "DAY", "WK": "WEEK", "WW": "WEEK",
+    "DW": "DAYOFWEEK", "WEEKDAY": "DAYOFWEEK", "HH": "HOUR", "MI": "MINUTE", "N": "MINUTE", "SS": "SECOND", "S": "SECOND",
+}
+_SECONDS = {"HOUR": 3600, "MINUTE": 60, "SECOND": 1}
+_MONTHS = {"YEAR": 12, "QUARTER": 3, "MONTH": 1}
+_DAY_ZERO = datetime(1900, 1, 1)
+
+
+def _unit(name) -> str:
+    name = str(name).upper()
+    return _UNIT_ALIASES.get(name, name)
+
+
+def _parse_date(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        # Like SQL Server, a number is a day count from 1900-01-01 (as in DATEDIFF(MONTH, 0, GETDATE()))
+        return _DAY_ZERO + timedelta(days=value)
+    return datetime.fromisoformat(value)
+
+
+def _format_date(value: datetime, like) -> str:
+    # Keep the input's shape: dates stay dates, timestamps and day counts become timestamps
+    is_date = isinstance(like, str) and len(like) <= 10
+    return value.strftime("%Y-%m-%d" if is_date else "%Y-%m-%d %H:%M:%S")
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    # Like T-SQL, a day past the end of the target month is clamped to its last day
+    year, month = divmod(value.month - 1 + months, 12)
+    year += value.year
+    return value.replace(year=year, month=month + 1, day=min(value.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def _date_from_parts(year, month, day) -> Optional[str]:
+    if None in (year, month, day):
+        return None
+    return date(int(year), int(month), int(day)).isoformat()
+
+
+def _eomonth(value) -> Optional[str]:
+    start = _parse_date(value)
+    if start is None:
+        return None
+    return date(start.year, start.month, calendar.monthrange(start.year, start.month)[1]).isoformat()
+
+
+def _dateadd(unit, number, value) -> Optional[str]:
+    start = _parse_date(value)
+    if start is None or number is None:
+        return None
+    unit, number = _unit(unit), int(number)
+    if unit in _MONTHS:
+        result = _add_months(start, number * _MONTHS[unit])
+    elif unit == "WEEK":
+        result = start + timedelta(weeks=number)
+    elif unit in _SECONDS:
+        result = start + timedelta(seconds=number * _SECONDS[unit])
+    else:
+        result = start + timedelta(days=number)
+    return _format_date(result, value)
+
+
+def _datediff(unit, start, end) -> Optional[int]:
+    """Number of unit boundaries crossed between start and end, as T-SQL counts them."""
+    first, last = _parse_date(start), _parse_date(end)
+    if first is None or last is None:
+        return None
+    unit = _unit(unit)
+    if unit in _MONTHS:
+        size = _MONTHS[unit]
+        return (last.year * 12 + last.month - 1) // size - (first.year * 12 + first.month - 1) // size
+    if unit == "WEEK":
+        # Weeks start on Sunday; date ordinal 7 is a Sunday
+        return last.toordinal() // 7 - first.toordinal() // 7
+    if unit in _SECONDS:
+        size = _SECONDS[unit]
+        ticks = lambda d: (d.toordinal() * 86400 + d.hour * 3600 + d.minute * 60 + d.second) // size
+        return ticks(last) - ticks(first)
+    return last.toordinal() - first.toordinal()
+
+
+def _datepart(unit, value) -> Optional[int]:
+    moment = _parse_date(value)
+    if moment is None:
+        return None
+    unit = _unit(unit)
+    if unit == "QUARTER":
+        return (moment.month - 1) // 3 + 1
+    if unit == "DAYOFYEAR":
+        return moment.timetuple().tm_yday
+    if unit == "DAYOFWEEK":
+        # Sunday = 1, the T-SQL default (DATEFIRST 7)
+        return moment.isoweekday() % 7 + 1
+    if unit == "WEEK":
+        jan1 = date(moment.year, 1, 1)
+        return (moment.timetuple().tm_yday + jan1.isoweekday() % 7 - 1) // 7 + 1
+    return getattr(moment, unit.lower())
+
+
+def _datename(unit, value) -> Optional[str]:
+    moment = _parse_date(value)
+    if moment is None:
+        return None
+    unit = _unit(unit)
+    if unit == "MONTH":
+        return calendar.month_name[moment.month]
+    if unit == "DAYOFWEEK":
+        return calendar.day_name[moment.weekday()]
+    return str(_datepart(unit, value))
+
+
+def _register_functions(conn: sqlite3.Connection):
+    """T-SQL date functions sqlglot leaves as plain function calls, or that _rewrite_dates emits."""
+    for name, start, end in (("YEAR", 0, 4), ("MONTH", 5, 7), ("DAY", 8, 10)):
+        conn.create_function(name, 1, lambda v, s=start, e=end: int(str(v)[s:e]) if v else None, deterministic=True)
+    conn.create_function("DATE_FROM_PARTS", 3, _date_from_parts, deterministic=True)
+    conn.create_function("LAST_DAY", 1, _eomonth, deterministic=True)
+    conn.create_function("DATEADD", 3, _dateadd, deterministic=True)
+    conn.create_function("DATEDIFF", 3, _datediff, deterministic=True)
+    conn.create_function("DATEPART", 2, _datepart, deterministic=True)
+    conn.create_function("DATENAME", 2, _datename, deterministic=True)
+
+
+# sqlglot parses DATENAME(unit, x) as a strftime of CAST(x AS DATETIME2) with these formats
+_DATENAME_UNITS = {
+    "%B": "MONTH", "%A": "DAYOFWEEK", "%Y": "YEAR", "%d": "DAY", "%j": "DAYOFYEAR",
+    "%W": "WEEK", "%h": "HOUR", "%M": "MINUTE", "%S": "SECOND",
+}
+
+
+def _date_call(node: exp.Expression) -> exp.Expression:
+    """One date expression as a call to the registered functions, or the node itself."""
+    if isinstance(node, exp.DateAdd):
+        unit = exp.Literal.string(node.text("unit") or "DAY")
+        return exp.Anonymous(this="DATEADD", expressions=[unit, node.expression, node.this])
+    if isinstance(node, exp.DateDiff):
+        unit = exp.Literal.string(node.text("unit") or "DAY")
+        return exp.Anonymous(this="DATEDIFF", expressions=[unit, node.expression, node.this])
+    if isinstance(node, exp.Extract):
+        return exp.Anonymous(this="DATEPART", expressions=[exp.Literal.string(node.this.name), node.expression])
+    if isinstance(node, exp.TimeToStr) and isinstance(node.this, exp.Cast) and node.this.to.this == exp.DataType.Type.DATETIME2:
+        fmt = node.text("format")
+        unit = exp.Literal.string(_DATENAME_UNITS.get(fmt, fmt))
+        return exp.Anonymous(this="DATENAME", expressions=[unit, node.this.this])
+    return node
+
+
+def _rewrite_dates(tree: exp.Expression) -> exp.Expression:
+    """
+    Date arithmetic sqlglot would turn into SQLite modifiers, EXTRACT or CASTs, as calls to the registered functions.
+    Innermost expressions are rewritten first, so a date function nested in another one is rewritten too.
+    """
+    # Reversed pre-order puts every node after its descendants
+    for node in reversed(list(tree.find_all(exp.DateAdd, exp.DateDiff, exp.Extract, exp.TimeToStr, bfs=False))):
+        call = _date_call(node)
+        if call is not node:
+            if node is tree:
+                return call
+            node.replace(call)
+    return tree
+
+
+def load_csvs(conn: sqlite3.Connection, folder: str = CSV_DIR, skip=("metadata",)):
+    """Create one table per CSV file and bulk-insert its rows."""
+    for file in sorted(os.listdir(folder)):
+        table, ext = os.path.splitext(file)
+        if ext != ".csv" or table in skip:
+            continue
+        with open(os.path.join(folder, file), "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            columns = ", ".join(f'"{c}"' for c in header)
+            placeholders = ", ".join("?" for _ in header)
+            conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+            conn.execute(f'CREATE TABLE "{table}" ({columns})')
+            conn.executemany(
+                f'INSERT INTO "{table}" VALUES ({placeholders})',
+                ([_convert(v) for v in row] for row in reader),
+            )
+    conn.commit()
+
+
+class SQLiteBackend:
+    """
+    Embedded, read-only SQLite copy of the CSV exports, for local runs and CI benchmarks.
+    Generated T-SQL is transpiled to SQLite with sqlglot before it runs.
+    - path: database file ("" keeps the database in memory, shared by every thread of the process)
+    - csv_dir: folder whose *.csv files are loaded at startup, one table per file ("" skips loading)
+    """
+
+    dialect = "sqlite"
+    _memory_ids = itertools.count(1)
+
+    def __init__(self, path: str = "", csv_dir: str = CSV_DIR):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._uri = f"file:{os.path.abspath(path)}"
+        else:
+            self._uri = f"file:sqlwise_{next(SQLiteBackend._memory_ids)}?mode=memory&cache=shared"
+        # Owns the schema and keeps a shared in-memory database alive
+        self._writer = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        if csv_dir:
+            load_csvs(self._writer, csv_dir)
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            _register_functions(conn)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        yield self._thread_connection()
+
+    def prepare(self, query: str) -> str:
+        return _rewrite_dates(sqlglot.parse_one(query, read="tsql")).sql(dialect="sqlite")
+
+    def is_disconnect(self, e: Exception) -> bool:
+        return False
+
+    def set_timeout(self, conn: sqlite3.Connection, seconds: float):
+        # No engine-side timeout; the guard's watchdog interrupts overrunning statements
+        pass
+
+    def cancel(self, conn: sqlite3.Connection, cursor):
+        conn.interrupt()
+
+    def is_timeout(self, e: Exception) -> bool:
+        return isinstance(e, sqlite3.OperationalError) and str(e) == "interrupted"
+
+    def estimate_cost(self, conn: sqlite3.Connection, query: str) -> Optional[float]:
+        # EXPLAIN QUERY PLAN carries no cost estimate
+        return None
+
+    def describe(self) -> list[tuple]:
+        conn = self._thread_connection()
+        columns = []
+        for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name").fetchall():
+            for _cid, name, data_type, *_ in conn.execute(f'PRAGMA table_info("{table}")').fetchall():
+                columns.append(("main", table, name, data_type or "UNKNOWN"))
+        return columns
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._writer.close()
+
+
+_shared_backend: Optional[SQLiteBackend] = None
+_shared_lock = threading.Lock()
+
+def get_sqlite_backend() -> SQLiteBackend:
+    """Process-wide SQLite backend built from SQLITE_PATH / SQLITE_CSV_DIR."""
+    global _shared_backend
+    if _shared_backend is None:
+        with _shared_lock:
+            if _shared_backend is None:
+                _shared_backend = SQLiteBackend(
+                    path=settings.SQLITE_PATH,
+                    csv_dir=settings.SQLITE_CSV_DIR or CSV_DIR,
+                )
+                logging.info("SQLite execution backend loaded.")
+    return _shared_backend
+
+
+def close_sqlite_backend():
+    global _shared_backend
+    with _shared_lock:
+        if _shared_backend is not None:
+            _shared_backend.close()
+            _shared_backend = None
@@ -1,7 +1,22 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from router import routes
+from src.rag import get_rag_pipeline
+from db_setup.db import close_pools
+from db_setup.sqlite_backend import close_sqlite_backend
 
-fast_app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    rag = get_rag_pipeline()
+    rag.warm_up()
+    yield
+    rag.close()
+    close_pools()
+    close_sqlite_backend()
+
+
+fast_app = FastAPI(lifespan=lifespan)
 
 fast_app.include_router(routes.api_router)
 
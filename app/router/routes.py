@@ -1,75 +1,44 @@
 import json
-from fastapi import APIRouter
-from workflow.rag_pipeline import (
-    rewrite_user_query,
-    retrieve_context_parallel,
-    prepare_context_and_examples,
-    create_sql_plan,
-    generate_sql_query,
-    validate_generated_sql,
-    execute_and_heal_sql,
-    analyze_sql_results
-)
-from src.rag import RAGPipeline
-from db_setup.db import SQLDB
-from workflow.helper import format_json_results
-from fastapi.responses import StreamingResponse
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from workflow.orchestrator import run_pipeline
+from workflow.result_transport import ENCODINGS, arrow_available
+from workflow.semantic_cache import get_semantic_cache
+from workflow.single_flight import get_single_flight, normalize_question
+from src.config import settings
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from src.metrics import REGISTRY
 
 api_router = APIRouter()
 
-def run_pipeline_orchestrator(question: str):
+def _sse(event: str, payload: dict) -> str:
+    """One Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def _update_event(update: dict) -> str:
+    """SSE frame for one pipeline update: "status", "data", "rows", "token", "error" or "complete"."""
+    if "token" in update:
+        return _sse("token", {"token": update["token"]})
+    if "rows" in update:
+        return _sse("rows", update["rows"])
+    payload = {"message": update["status"], **{k: v for k, v in update.items() if k not in ("status", "data")}}
+    if "data" in update:
+        return _sse("data", {**payload, **update["data"]})
+    if "error" in update:
+        return _sse("error", payload)
+    if "analysis" in update:
+        return _sse("complete", payload)
+    return _sse("status", payload)
+
+async def run_pipeline_orchestrator(question: str, encoding: str = "json"):
     """
-    Main Pipeline Orchestration using a generator for message updates.
-    Yields dicts with 'message' and optionally 'data' or 'error'.
+    The shared async pipeline (workflow.orchestrator.run_pipeline) as Server-Sent Events.
+    Yields SSE frames: "status" (step messages with stage timings), "data" (result columns and types),
+    "rows" (columnar row batches, JSON or base64 Arrow IPC per encoding), "token" (analysis text as it
+    is generated), "error" and "complete" (full analysis).
     """
-    rag = RAGPipeline()
-    db = SQLDB()
-    
-    yield json.dumps({"message": "Starting pipeline...", "step": 0}) + "\n"
-    
-    # Step 1: Rewrite
-    yield json.dumps({"message": "Rewriting query...", "step": 1}) + "\n"
-    rewritten_q = rewrite_user_query(question)
-    
-    # Step 2: Parallel RAG
-    yield json.dumps({"message": "Retrieving context and examples...", "step": 2}) + "\n"
-    retrieval_results = retrieve_context_parallel(rewritten_q, rag)
-    
-    # Step 3: Context Assembly
-    yield json.dumps({"statu": "Assembling context...", "step": 3}) + "\n"
-    context, few_shots = prepare_context_and_examples(retrieval_results)
-    
-    # Step 4: Query Planning
-    yield json.dumps({"message": "Creating SQL plan...", "step": 4}) + "\n"
-    plan = create_sql_plan(question, context)
-    
-    # Step 5: SQL Generation
-    yield json.dumps({"message": "Generating SQL query...", "step": 5}) + "\n"
-    sql_response = generate_sql_query(question, context, few_shots, plan)
-    
-    # Step 6: Smart Validation
-    yield json.dumps({"message": "Validating SQL...", "step": 6.1}) + "\n"
-    validated_response = validate_generated_sql(question, sql_response, context)
-    
-    if hasattr(validated_response, "query"):
-        yield json.dumps({"message": "SQL generated successfully", "step": 6.2}) + "\n"
-    
-    # Step 7: Execution & Healing
-    yield json.dumps({"message": "Executing SQL engine...", "step": 7}) + "\n"
-    data, error = execute_and_heal_sql(question, validated_response, db, context)
-    
-    if error:
-        yield json.dumps({"message": "Pipeline failed", "error": str(error)}) + "\n"
-        return
-
-    formatted_data = format_json_results(data)
-    yield json.dumps({"message": "Data retrieved successfully", "data": str(formatted_data)}) + "\n"
-    
-    # Step 8: Data Analysis
-    yield json.dumps({"message": "Analyzing results...", "step": 8}) + "\n"
-    analysis = analyze_sql_results(question, data) # type: ignore
-    
-    yield json.dumps({"message": "Pipeline completed", "analysis": str(analysis.content)}) + "\n" # type: ignore
+    async for update in run_pipeline(question, stream_analysis=True, encoding=encoding):
+        yield _update_event(update)
 
 
 
@@ -78,6 +47,33 @@ def health_check():
     return {"status":200, "message":"Sucess OK !!"}
 
 
+@api_router.get('/metrics')
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@api_router.delete('/cache')
+def invalidate_cache(question: Optional[str] = None):
+    cache = get_semantic_cache()
+    removed = cache.invalidate(question) if cache else 0
+    return {"status": 200, "invalidated": removed}
+
+
 @api_router.get('/rag/excute')
-def rag_execute(question:str):
-    return StreamingResponse(run_pipeline_orchestrator(question), media_type="text/event-stream")
+async def rag_execute(question:str, encoding: str = "json"):
+    if encoding not in ENCODINGS:
+        raise HTTPException(status_code=400, detail=f"encoding must be one of {', '.join(ENCODINGS)}")
+    if encoding == "arrow" and not arrow_available():
+        raise HTTPException(status_code=400, detail="Arrow encoding needs pyarrow installed on the server")
+    if settings.SINGLE_FLIGHT_ENABLED:
+        # Identical questions already in flight share one pipeline run and its events
+        key = f"{encoding}:{normalize_question(question)}"
+        events = get_single_flight().stream(key, lambda: run_pipeline_orchestrator(question, encoding))
+    else:
+        events = run_pipeline_orchestrator(question, encoding)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Keep proxies from buffering the token stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,21 +1,42 @@
-import sys
 import os
 import json
+from typing import Optional
+import typer
 from db_setup.helper import setup
-from src.rag import RAGPipeline
+from src.rag import RAGPipeline, COLLECTIONS
 
+app = typer.Typer(rich_markup_mode="rich")
+
+
+@app.command()
+def main(
+    tables: Optional[str] = typer.Option(None, help="Comma-separated tables to process; asked interactively when omitted."),
+    all_tables: bool = typer.Option(False, "--all", help="Process every table in the database."),
+    workers: Optional[int] = typer.Option(None, help="LLM calls run at once (default SETUP_WORKERS)."),
+    fresh: bool = typer.Option(False, "--fresh", help="Discard checkpoints of an interrupted run instead of resuming it."),
+    full: bool = typer.Option(False, "--full", help="Regenerate every chunk, not only those of changed tables."),
+    skip_index: bool = typer.Option(False, "--skip-index", help="Only generate json_chunks, don't index them."),
+):
+    """Generate the knowledge-base chunks for the selected tables and index them."""
+    selected = ["all"] if all_tables else ([t.strip() for t in tables.split(",") if t.strip()] if tables else None)
+    if not setup(selected, workers=workers, fresh=fresh, full=full):
+        raise typer.Exit(code=1)
+    if skip_index:
+        return
 
-if __name__ == "__main__":
-    setup()
     rag = RAGPipeline()
     folder = "json_chunks"
 
-    files_path = [os.path.join(folder, file) for file in os.listdir(folder) if file.endswith(".json")]
+    # Only the chunk files; json_chunks also holds the setup's schema fingerprints
+    files_path = [os.path.join(folder, f"{name}.json") for name in COLLECTIONS]
 
     for file_path in files_path:
         with open(file_path, "r") as f:
             collection_name = file_path.split("/")[-1].split(".")[0]
             print( "Collection Name: ", collection_name)
-            rag.create_chunks_index(json.load(f), collection_name)
+            summary = rag.create_chunks_index(json.load(f), collection_name)
+            print(f"  added {summary['added']}, deleted {summary['deleted']}, unchanged {summary['unchanged']}")
 
 
+if __name__ == "__main__":
+    app()
@@ -6,14 +6,60 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str
     OPENAI_BASE_URL: str
     OPENAI_MODEL: str
-    DB_SERVER: str
-    DB_NAME: str
-    DB_USER: str
-    DB_PASSWORD: str
-    DB_DRIVER: str
+    DB_SERVER: str = ""
+    DB_NAME: str = ""
+    DB_USER: str = ""
+    DB_PASSWORD: str = ""
+    DB_DRIVER: str = ""
     COHERE_API_KEY: str
     QDRANT_URL: str
     TOKENIZERS_PARALLELISM : bool
+    DB_BACKEND: str = "mssql"
+    SQLITE_PATH: str = ""
+    SQLITE_CSV_DIR: str = ""
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_IDLE_TIMEOUT: float = 300
+    DB_POOL_HEALTH_CHECK_INTERVAL: float = 30
+    DB_POOL_TIMEOUT: float = 30
+    DB_FETCH_BATCH_SIZE: int = 500
+    DB_MAX_ROWS: int = 10000
+    DB_MAX_BYTES: int = 16 * 1024 * 1024
+    DB_EXECUTOR_WORKERS: int = 10
+    QNA_FAST_PATH_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_TTL: float = 3600
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 512
+    SEMANTIC_CACHE_PATH: str = ""
+    SQL_CACHE_ENABLED: bool = True
+    SQL_CACHE_TTL: float = 3600
+    SQL_CACHE_TABLE_TTLS: dict[str, float] = {}
+    SQL_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    ANALYST_TOKEN_BUDGET: int = 2000
+    ANALYST_SAMPLE_ROWS: int = 10
+    ANALYST_TOP_K: int = 5
+    CONTEXT_TOKEN_BUDGETS: dict[str, int] = {"planner": 3000, "sql": 3000, "healer": 2000}
+    AGENT_LLM_PARAMS: dict[str, dict] = {}
+    LLM_CACHE_ENABLED: bool = False
+    LLM_CACHE_TTL: float = 86400
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_PATH: str = ""
+    LLM_CACHE_MAX_DISK_ENTRIES: int = 10000
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SCHEMA_CATALOG_ENABLED: bool = True
+    SCHEMA_CATALOG_PATH: str = ""
+    SCHEMA_CATALOG_TTL: float = 86400
+    HEAL_CANDIDATES: int = 1
+    HEAL_CANDIDATE_TEMPERATURES: list[float] = [0.0, 0.4, 0.8]
+    QUERY_GUARD_ENABLED: bool = True
+    QUERY_TIMEOUT: float = 30
+    QUERY_MAX_COST: float = 0
+    RESULT_BATCH_ROWS: int = 500
+    SETUP_WORKERS: int = 3
+    INDEX_BATCH_SIZE: int = 96
+    INDEX_WORKERS: int = 4
+    TOKEN_ENCODING: str = "o200k_base"
    # VECTOR_DB_PATH: str
 
     class Config:
@@ -1,5 +1,10 @@
+import time
+import asyncio
+import threading
 from langchain_openai import ChatOpenAI
 from .config import settings
+from .metrics import AGENT_SECONDS, AGENT_FIRST_TOKEN_SECONDS, AGENT_ERRORS, LLM_CACHE_LOOKUPS, record_usage
+from .llm_cache import get_llm_cache, response_key
 from .prompts import (
     sql_system_prompt, data_analyst_prompt,
     query_validator_prompt, query_rewriter_prompt, query_planner_prompt,
@@ -13,7 +18,7 @@ from schema import (
 )
 from langchain_core.prompts import ChatPromptTemplate
 from dotenv import load_dotenv
-from typing import Optional
+from typing import AsyncIterator, Iterator, Optional
 load_dotenv()
 
 
@@ -26,108 +31,287 @@ llm = ChatOpenAI(
 
 
 class BaseAgent:
-    def __init__(self, system_prompt: str):
+    """
+    Agent over the shared chat model.
+    The prompt is compiled once and the prompt | model runnable once per output schema (on first use),
+    so calls only pay for the request itself. Compiled runnables are immutable and safe to share between threads.
+    - llm_params: per-agent model overrides (e.g. temperature, max_tokens); AGENT_LLM_PARAMS[<class name>] wins
+    Agents with cacheable = True answer repeated identical inputs from the LLM response cache (LLM_CACHE_ENABLED).
+    """
+
+    cacheable = False
+
+    def __init__(self, system_prompt: str, **llm_params):
         self.system_prompt = system_prompt
-    
-    def base_agent(self, question: str, data: Optional[str] = None, schema: Optional[object] = None):
-        prompt = ChatPromptTemplate.from_messages([
+        self.llm_params = {**llm_params, **settings.AGENT_LLM_PARAMS.get(type(self).__name__, {})}
+        self.prompt = ChatPromptTemplate.from_messages([
         ("system", self.system_prompt),
         ("user", "{question} \n {data}"),])
-
-        chain = prompt | llm
-
+        self._model = None
+        self._chains: dict = {}
+        self._lock = threading.RLock()
+
+    @property
+    def model(self):
+        """The shared model, copied with this agent's parameters when it has any. Resolved on first use."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = llm.model_copy(update=self.llm_params) if self.llm_params else llm
+        return self._model
+
+    def _build_chain(self, schema: Optional[object] = None):
         if schema:
-            chain = prompt | llm.with_structured_output(schema)
-            return chain.invoke({"question": question, "data": data})
-        return chain.invoke({"question": question, "data": data})
+            # include_raw keeps the AIMessage around so token usage can be recorded
+            return self.prompt | self.model.with_structured_output(schema, include_raw=True)
+        return self.prompt | self.model
+
+    def _chain(self, schema: Optional[object] = None):
+        chain = self._chains.get(schema)
+        if chain is None:
+            with self._lock:
+                chain = self._chains.get(schema)
+                if chain is None:
+                    chain = self._chains[schema] = self._build_chain(schema)
+        return chain
+
+    def _unwrap(self, result, schema: Optional[object] = None):
+        """Record token usage and return the parsed output (or the message when there is no schema)."""
+        agent = type(self).__name__
+        if not schema:
+            record_usage(agent, result)
+            return result
+        record_usage(agent, result.get("raw"))
+        if result.get("parsing_error") is not None:
+            raise result["parsing_error"]
+        return result["parsed"]
+
+    def _cache_lookup(self, question: str, data: Optional[str], schema: Optional[object]):
+        """(cache, key, cached response) for a cacheable agent, or (None, None, None) when caching is off."""
+        if not self.cacheable:
+            return None, None, None
+        cache = get_llm_cache()
+        if cache is None:
+            return None, None, None
+        messages = self.prompt.format_messages(question=question, data=data)
+        model_name = getattr(self.model, "model_name", None) or type(self.model).__name__
+        key = response_key(messages, model_name, self.llm_params, schema)
+        cached = cache.get(key, schema)
+        LLM_CACHE_LOOKUPS.inc(agent=type(self).__name__, result="miss" if cached is None else "hit")
+        return cache, key, cached
+
+    def base_agent(self, question: str, data: Optional[str] = None, schema: Optional[object] = None):
+        cache, key, cached = self._cache_lookup(question, data, schema)
+        if cached is not None:
+            return cached
+        chain = self._chain(schema)
+        start = time.perf_counter()
+        try:
+            result = chain.invoke({"question": question, "data": data})
+        except Exception:
+            AGENT_ERRORS.inc(agent=type(self).__name__)
+            raise
+        finally:
+            AGENT_SECONDS.observe(time.perf_counter() - start, agent=type(self).__name__)
+        response = self._unwrap(result, schema)
+        if cache is not None:
+            cache.put(key, response, schema)
+        return response
+
+    async def abase_agent(self, question: str, data: Optional[str] = None, schema: Optional[object] = None):
+        # The response cache may read and write SQLite; keep that off the event loop
+        cache, key, cached = await asyncio.to_thread(self._cache_lookup, question, data, schema)
+        if cached is not None:
+            return cached
+        chain = self._chain(schema)
+        start = time.perf_counter()
+        try:
+            result = await chain.ainvoke({"question": question, "data": data})
+        except Exception:
+            AGENT_ERRORS.inc(agent=type(self).__name__)
+            raise
+        finally:
+            AGENT_SECONDS.observe(time.perf_counter() - start, agent=type(self).__name__)
+        response = self._unwrap(result, schema)
+        if cache is not None:
+            await asyncio.to_thread(cache.put, key, response, schema)
+        return response
+
+    def stream_agent(self, question: str, data: Optional[str] = None) -> Iterator[str]:
+        """Yield the plain-text response as it is generated (no schema, no response cache)."""
+        agent = type(self).__name__
+        start = time.perf_counter()
+        final, streamed = None, False
+        try:
+            for chunk in self._chain().stream({"question": question, "data": data}):
+                final = chunk if final is None else final + chunk
+                if chunk.content:
+                    if not streamed:
+                        AGENT_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start, agent=agent)
+                        streamed = True
+                    yield chunk.content
+        except Exception:
+            AGENT_ERRORS.inc(agent=agent)
+            raise
+        finally:
+            AGENT_SECONDS.observe(time.perf_counter() - start, agent=agent)
+        record_usage(agent, final)
+
+    async def astream_agent(self, question: str, data: Optional[str] = None) -> AsyncIterator[str]:
+        agent = type(self).__name__
+        start = time.perf_counter()
+        final, streamed = None, False
+        try:
+            async for chunk in self._chain().astream({"question": question, "data": data}):
+                final = chunk if final is None else final + chunk
+                if chunk.content:
+                    if not streamed:
+                        AGENT_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start, agent=agent)
+                        streamed = True
+                    yield chunk.content
+        except Exception:
+            AGENT_ERRORS.inc(agent=agent)
+            raise
+        finally:
+            AGENT_SECONDS.observe(time.perf_counter() - start, agent=agent)
+        record_usage(agent, final)
 
 
 
 class SQLAgent(BaseAgent):
-    def __init__(self):
-        super().__init__(sql_system_prompt)
+    cacheable = True
+
+    def __init__(self, **llm_params):
+        super().__init__(sql_system_prompt, **llm_params)
     
     def sql_agent(self, question: str):
         schema = SqlResponse
         return self.base_agent(question=question, schema=schema)
 
+    async def asql_agent(self, question: str):
+        return await self.abase_agent(question=question, schema=SqlResponse)
+
 class DataAnalystAgent(BaseAgent):
-    def __init__(self):
-        super().__init__(data_analyst_prompt)
+    def __init__(self, **llm_params):
+        super().__init__(data_analyst_prompt, **llm_params)
     
     def data_analyst(self, question: str, data: str):
         schema = None
         return self.base_agent(question=question, data=data)
 
+    async def adata_analyst(self, question: str, data: str):
+        return await self.abase_agent(question=question, data=data)
+
+    def stream_data_analyst(self, question: str, data: str) -> Iterator[str]:
+        return self.stream_agent(question=question, data=data)
+
+    def astream_data_analyst(self, question: str, data: str) -> AsyncIterator[str]:
+        return self.astream_agent(question=question, data=data)
+
 
 
 class QueryValidatorAgent(BaseAgent):
-    def __init__(self):
-        super().__init__(query_validator_prompt)
+    def __init__(self, **llm_params):
+        super().__init__(query_validator_prompt, **llm_params)
     
     def validate_query(self, query: str, data: str):
         schema = SqlResponse
         return self.base_agent(question=query, data=data, schema=schema)
 
+    async def avalidate_query(self, query: str, data: str):
+        return await self.abase_agent(question=query, data=data, schema=SqlResponse)
+
 
 # ─── RAH Pipeline Agents ──────────────────────────────────────────
 
 class QueryRewriterAgent(BaseAgent):
-    def __init__(self):
-        super().__init__(query_rewriter_prompt)
+    cacheable = True
+
+    def __init__(self, **llm_params):
+        super().__init__(query_rewriter_prompt, **llm_params)
 
     def rewrite(self, question: str, db_context: str = "") -> str:
         return self.base_agent(question=question, data=db_context).content
 
+    async def arewrite(self, question: str, db_context: str = "") -> str:
+        return (await self.abase_agent(question=question, data=db_context)).content
+
 
 class QueryPlannerAgent(BaseAgent):
-    def __init__(self):
-        super().__init__(query_planner_prompt)
+    cacheable = True
+
+    def __init__(self, **llm_params):
+        super().__init__(query_planner_prompt, **llm_params)
 
     def plan(self, question: str, context: str) -> QueryPlan:
         return self.base_agent(question=question, data=context, schema=QueryPlan)
 
+    async def aplan(self, question: str, context: str) -> QueryPlan:
+        return await self.abase_agent(question=question, data=context, schema=QueryPlan)
+
 
 class SelfHealerAgent(BaseAgent):
-    def __init__(self):
-        super().__init__(self_healer_prompt)
+    """
+    Repairs a failed query from the error it raised.
+    - strategy: optional repair instruction appended to the diagnosis, so parallel healers propose different fixes
+    """
 
-    def heal(self, question: str, failed_sql: str, error_msg: str, context: str) -> SqlResponse:
-        diagnosis_input = (
+    def __init__(self, strategy: str = "", **llm_params):
+        super().__init__(self_healer_prompt, **llm_params)
+        self.strategy = strategy
+
+    def _diagnosis_input(self, question: str, failed_sql: str, error_msg: str, context: str) -> str:
+        diagnosis = (
             f"Original Question: {question}\n\n"
             f"Failed SQL Query:\n{failed_sql}\n\n"
             f"Error / Issue:\n{error_msg}\n\n"
             f"Database Context:\n{context}"
         )
+        return f"{diagnosis}\n\nRepair Strategy: {self.strategy}" if self.strategy else diagnosis
+
+    def heal(self, question: str, failed_sql: str, error_msg: str, context: str) -> SqlResponse:
+        diagnosis_input = self._diagnosis_input(question, failed_sql, error_msg, context)
         return self.base_agent(question=diagnosis_input, schema=SqlResponse)
 
+    async def aheal(self, question: str, failed_sql: str, error_msg: str, context: str) -> SqlResponse:
+        diagnosis_input = self._diagnosis_input(question, failed_sql, error_msg, context)
+        return await self.abase_agent(question=diagnosis_input, schema=SqlResponse)
+
 
 # ─── Data Ingestion / Setup Agents ────────────────────────────────
 
 class SchemaChunkerAgent(BaseAgent):
-    def __init__(self):
-        super().__init__(schema_chunker_prompt)
+    cacheable = True
+
+    def __init__(self, **llm_params):
+        super().__init__(schema_chunker_prompt, **llm_params)
 
     def generate_chunks(self, schema_context: str) -> DBChunksResponse:
         return self.base_agent(question="", data=schema_context, schema=DBChunksResponse)
 
 class BusinessLogicChunkerAgent(BaseAgent):
-    def __init__(self):
-        super().__init__(business_logic_chunker_prompt)
+    cacheable = True
+
+    def __init__(self, **llm_params):
+        super().__init__(business_logic_chunker_prompt, **llm_params)
 
     def generate_business_logic(self, schema_context: str) -> BusinessLogicResponse:
         return self.base_agent(question="", data=schema_context, schema=BusinessLogicResponse)
 
 class QnAChunkerAgent(BaseAgent):
-    def __init__(self):
-        super().__init__(qna_chunker_prompt)
+    cacheable = True
+
+    def __init__(self, **llm_params):
+        super().__init__(qna_chunker_prompt, **llm_params)
 
     def generate_qna(self, schema_context: str) -> QnAResponse:
         return self.base_agent(question="", data=schema_context, schema=QnAResponse)
 
 class CategoryGeneratorAgent(BaseAgent):
-    def __init__(self):
-        super().__init__(category_generator_prompt)
+    cacheable = True
+
+    def __init__(self, **llm_params):
+        super().__init__(category_generator_prompt, **llm_params)
 
     def generate_categories(self, schema_context: str) -> CategoriesResponse:
         return self.base_agent(question="", data=schema_context, schema=CategoriesResponse)
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from collections import OrderedDict
+from typing import Optional
+from langchain_core.messages import AIMessage
+from .config import settings
+
+
+@lru_cache(maxsize=None)
+def _schema_id(schema) -> Optional[str]:
+    if schema is None:
+        return None
+    return f"{schema.__module__}.{schema.__qualname__}:{json.dumps(schema.model_json_schema(), sort_keys=True)}"
+
+
+def response_key(messages: list, model: str, params: dict, schema: Optional[object]) -> str:
+    """Hash of everything that determines a response: rendered messages (system prompt included), model, params and schema."""
+    payload = json.dumps(
+        {
+            "messages": [[m.type, m.content] for m in messages],
+            "model": model,
+            "params": params,
+            "schema": _schema_id(schema),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Exact-match cache of agent responses.
+    Structured responses are kept as the parsed Pydantic model, plain ones as the message content.
+    - ttl: seconds an entry stays valid (0 keeps entries forever)
+    - max_entries: in-memory LRU bound
+    - path: optional SQLite file, a second tier that survives restarts (e.g. repeated setup runs)
+    - max_disk_entries: bound of the SQLite tier, oldest entries are deleted first
+      (swept every EVICT_EVERY writes, so the table can briefly hold up to EVICT_EVERY more)
+    """
+
+    EVICT_EVERY = 100
+
+    def __init__(self, ttl: float = 86400, max_entries: int = 1024, path: Optional[str] = None, max_disk_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, payload TEXT, created_at REAL)"
+            )
+            self._db.commit()
+
+    def _expired(self, created_at: float) -> bool:
+        return bool(self.ttl) and time.time() - created_at > self.ttl
+
+    @staticmethod
+    def _copy(value):
+        if isinstance(value, AIMessage):
+            return AIMessage(content=value.content)
+        return value.model_copy(deep=True)
+
+    def get(self, key: str, schema: Optional[object] = None):
+        """Cached response or None; blocking (SQLite read on a memory miss), call it off the event loop."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if not self._expired(created_at):
+                    self._entries.move_to_end(key)
+                    return self._copy(value)
+                self._entries.pop(key)
+
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT payload, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            payload, created_at = row
+            if self._expired(created_at):
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            try:
+                value = schema.model_validate_json(payload) if schema else AIMessage(content=json.loads(payload))
+            except Exception as e:
+                logging.warning(f"Dropping unreadable LLM cache entry: {e}")
+                return None
+            self._remember_locked(key, value, created_at)
+            return self._copy(value)
+
+    def put(self, key: str, value, schema: Optional[object] = None):
+        """Store a response; blocking (SQLite write when persisted), call it off the event loop."""
+        created_at = time.time()
+        if schema is None:
+            value = AIMessage(content=value.content)
+        with self._lock:
+            self._remember_locked(key, self._copy(value), created_at)
+            if self._db is None:
+                return
+            try:
+                payload = value.model_dump_json() if schema else json.dumps(value.content)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)", (key, payload, created_at)
+                )
+                self._writes += 1
+                if self._writes % self.EVICT_EVERY == 0:
+                    self._db.execute(
+                        "DELETE FROM llm_cache WHERE key IN "
+                        "(SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_disk_entries,),
+                    )
+                self._db.commit()
+            except Exception as e:
+                logging.error(f"Failed to persist LLM cache entry: {e}")
+
+    def _remember_locked(self, key: str, value, created_at: float):
+        self._entries[key] = (value, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+
+_shared_cache: Optional[LLMResponseCache] = None
+_shared_lock = threading.Lock()
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Process-wide LLM response cache, or None when LLM_CACHE_ENABLED is off."""
+    global _shared_cache
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = LLMResponseCache(
+                    ttl=settings.LLM_CACHE_TTL,
+                    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+                    path=settings.LLM_CACHE_PATH or None,
+                    max_disk_entries=settings.LLM_CACHE_MAX_DISK_ENTRIES,
+                )
+                logging.info("LLM response cache enabled.")
+    return _shared_cache
@@ -0,0 +1,197 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 100, 1000, 10000, 100000)
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # bucket counts, sum, count
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    le = f'le="{_format_number(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {bucket_count}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: list[Callable[[], list[str]]] = []
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], list[str]]):
+        """Add a callable returning ready-made exposition lines (e.g. gauges read from a cache)."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "sqlwise_pipeline_stage_seconds", "Wall time of each pipeline stage.", ("stage",)
+)
+MILESTONE_SECONDS = REGISTRY.histogram(
+    "sqlwise_pipeline_milestone_seconds", "Time from the start of a request to a milestone (e.g. the first analysis token).", ("milestone",)
+)
+AGENT_SECONDS = REGISTRY.histogram(
+    "sqlwise_agent_call_seconds", "Wall time of each agent LLM call.", ("agent",)
+)
+AGENT_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "sqlwise_agent_first_token_seconds", "Time to the first streamed chunk of an agent response.", ("agent",)
+)
+AGENT_TOKENS = REGISTRY.histogram(
+    "sqlwise_agent_tokens", "Tokens per agent LLM call.", ("agent", "kind"), buckets=TOKEN_BUCKETS
+)
+AGENT_ERRORS = REGISTRY.counter(
+    "sqlwise_agent_errors_total", "Agent LLM calls that raised.", ("agent",)
+)
+LLM_CACHE_LOOKUPS = REGISTRY.counter(
+    "sqlwise_llm_cache_lookups_total", "Agent response cache lookups by result (hit/miss).", ("agent", "result")
+)
+SINGLE_FLIGHT_REQUESTS = REGISTRY.counter(
+    "sqlwise_single_flight_requests_total", "Pipeline requests by role: leader runs it, follower attaches to it.", ("role",)
+)
+HEAL_CANDIDATE_RESULTS = REGISTRY.counter(
+    "sqlwise_heal_candidates_total", "Parallel self-heal candidates by outcome (won/rejected/failed/empty/error/cancelled).", ("result",)
+)
+SQL_ATTEMPTS = REGISTRY.histogram(
+    "sqlwise_sql_execution_attempts", "Executions needed per query, including self-heal retries.", buckets=COUNT_BUCKETS
+)
+SQL_ROWS = REGISTRY.histogram(
+    "sqlwise_sql_rows_returned", "Rows returned by the final query.", buckets=COUNT_BUCKETS
+)
+
+
+def record_usage(agent: str, message) -> None:
+    """Record prompt/completion tokens from an AIMessage's usage_metadata, when the provider reports it."""
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return
+    AGENT_TOKENS.observe(usage.get("input_tokens", 0), agent=agent, kind="prompt")
+    AGENT_TOKENS.observe(usage.get("output_tokens", 0), agent=agent, kind="completion")
+
+
+class StageTimer:
+    """
+    Times pipeline stages for one request.
+    Every stage is observed into STAGE_SECONDS, every milestone into MILESTONE_SECONDS, and both are kept
+    in `timings` so step events can carry them.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = round(elapsed * 1000, 2)
+            STAGE_SECONDS.observe(elapsed, stage=name)
+
+    def mark(self, name: str):
+        """Record the time since the request started under name (e.g. time to the first analysis token)."""
+        elapsed = time.perf_counter() - self.started
+        self.timings[name] = round(elapsed * 1000, 2)
+        # Cumulative, so kept out of the per-stage durations
+        MILESTONE_SECONDS.observe(elapsed, milestone=name)
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.started
+        self.timings["total"] = round(elapsed * 1000, 2)
+        STAGE_SECONDS.observe(elapsed, stage="total")
+
+    def fields(self) -> dict:
+        """Timing fields for a step event: elapsed time so far and per-stage timings."""
+        return {
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "timings_ms": dict(self.timings),
+        }
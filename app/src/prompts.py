@@ -30,6 +30,7 @@ Based on the shared data, and question ask by business analyst, answer the quest
 2. Your response must be relevant, simple & short in language and easy to understand for a business person.
 3. The shared data is correct and accurate. Write what you see in the data. Do a perfect analysis.
 4. Need share your views analysis on the data, Provide best possible insights.
+5. Large results are shared as a summary: row_count, per-column stats, top_values, time_series and a small sample. Base totals and trends on the stats, the sample is only illustrative.
 """
 
 
@@ -2,53 +2,211 @@ import os
 import logging
 import json
 import uuid
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
 from .config import settings
 from langchain_core.documents import Document
 from langchain_qdrant import QdrantVectorStore
 from langchain_cohere import CohereEmbeddings
+from qdrant_client import QdrantClient, models
+
+COLLECTIONS = ("db", "business_logic", "qna")
+# Namespace of the content-derived point IDs
+_POINT_NAMESPACE = uuid.UUID("6f1c8a52-4b7e-4d1a-9a43-0c2f5e9d7b18")
+
+
+def chunk_document(chunk: dict) -> tuple[str, Document]:
+    """
+    The Document indexed for a chunk and its point ID, a UUID derived from the document content:
+    the same chunk always maps to the same point.
+    """
+    metadata = chunk.get("metadata", {})
+    data = {key: value for key, value in chunk.items() if key != "metadata"}
+    page_content = f"{data}"
+    point_id = str(uuid.uuid5(_POINT_NAMESPACE, json.dumps([page_content, metadata], sort_keys=True, default=str)))
+    return point_id, Document(page_content=page_content, metadata={"id": point_id, **metadata})
+
 
 
 class RAGPipeline:
     def __init__(self):
         self.embedder = CohereEmbeddings(model="embed-v4.0")
         self.qdrant_url = settings.QDRANT_URL
+        self._client: Optional[QdrantClient] = None
+        self._stores: dict[str, QdrantVectorStore] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def client(self) -> QdrantClient:
+        """One Qdrant client per pipeline, opened lazily and shared across threads."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = QdrantClient(url=self.qdrant_url)
+        return self._client
+
+    def get_vector_store(self, collection_name: str) -> QdrantVectorStore:
+        """Return the cached store handle for a collection, creating it on first use."""
+        store = self._stores.get(collection_name)
+        if store is None:
+            with self._lock:
+                store = self._stores.get(collection_name)
+                if store is None:
+                    store = QdrantVectorStore(
+                        client=self.client,
+                        collection_name=collection_name,
+                        embedding=self.embedder
+                    )
+                    self._stores[collection_name] = store
+        return store
+
+    def warm_up(self, collections=COLLECTIONS):
+        """Open the client and validate every collection up front so the first request doesn't pay for it."""
+        for collection_name in collections:
+            try:
+                self.get_vector_store(collection_name)
+            except Exception as e:
+                logging.error(f"Failed to warm up collection {collection_name}: {e}")
+
+    def close(self):
+        with self._lock:
+            self._stores.clear()
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def _point_ids(self, collection_name: str) -> set[str]:
+        """IDs of every point stored in a collection."""
+        ids, offset = set(), None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name, limit=1000, offset=offset, with_payload=False, with_vectors=False
+            )
+            ids.update(str(point.id) for point in points)
+            if offset is None:
+                return ids
+
+    def _embed_points(self, batch: list[tuple[str, Document]]) -> list[models.PointStruct]:
+        vectors = self.embedder.embed_documents([doc.page_content for _, doc in batch])
+        return [
+            models.PointStruct(id=point_id, vector=vector, payload={"page_content": doc.page_content, "metadata": doc.metadata})
+            for (point_id, doc), vector in zip(batch, vectors)
+        ]
 
-    def create_chunks_index(self, chunks: list[dict], collection_name: str):
-        logging.info("Creating chunks index.")
-        chunk_docs = []
+    def create_chunks_index(self, chunks: list[dict], collection_name: str) -> dict:
+        """
+        Bring a collection in line with chunks: embed and upsert only the chunks it doesn't hold yet, delete the points
+        of chunks that are gone. Point IDs are derived from the chunk content, so an unchanged chunk keeps its point and
+        an edited one replaces it. Embeddings run in INDEX_BATCH_SIZE batches, INDEX_WORKERS at a time.
+        Returns {"added", "deleted", "unchanged"} point counts.
+        """
+        logging.info(f"Indexing {len(chunks)} chunks into {collection_name}.")
+        docs = dict(chunk_document(chunk) for chunk in chunks)
 
-        try:
-            for chunk in chunks:
-                metadata = chunk["metadata"]
+        exists = self.client.collection_exists(collection_name)
+        stored = self._point_ids(collection_name) if exists else set()
+        new = [(point_id, doc) for point_id, doc in docs.items() if point_id not in stored]
+        stale = list(stored - docs.keys())
 
-                data = {key: value for key, value in chunk.items() if key != "metadata"}
-                doc = Document(
-                    page_content=f"{data}",
-                    metadata={"id": str(uuid.uuid4()), **metadata}
-                )
-                chunk_docs.append(doc)
+        size = settings.INDEX_BATCH_SIZE
+        batches = [new[i:i + size] for i in range(0, len(new), size)]
+        if batches and not exists:
+            # The first batch fixes the vector size of the new collection
+            points = self._embed_points(batches.pop(0))
+            self.client.create_collection(
+                collection_name,
+                vectors_config=models.VectorParams(size=len(points[0].vector), distance=models.Distance.COSINE),
+            )
+            self.client.upsert(collection_name, points=points)
+        with ThreadPoolExecutor(max_workers=max(settings.INDEX_WORKERS, 1)) as executor:
+            futures = [executor.submit(self._embed_points, batch) for batch in batches]
+            for future in as_completed(futures):
+                self.client.upsert(collection_name, points=future.result())
 
-        except json.JSONDecodeError as e:
-            logging.error(f"Failed to decode JSON: {e}")
+        # Stale points go only after their replacements are in, so the collection never misses a chunk
+        if stale:
+            self.client.delete(collection_name, points_selector=models.PointIdsList(points=stale))
 
+        # The collection may have just been created, drop any handle opened before it existed
+        with self._lock:
+            self._stores.pop(collection_name, None)
+        summary = {"added": len(new), "deleted": len(stale), "unchanged": len(docs) - len(new)}
+        logging.info(f"Indexed {collection_name}: {summary}")
+        return summary
 
-        QdrantVectorStore.from_documents(
-            documents=chunk_docs,
-            embedding=self.embedder,
-            collection_name=collection_name,
-            url=self.qdrant_url
+    def embed_query(self, user_query: str) -> list[float]:
+        return self.embedder.embed_query(user_query)
+
+    def query_by_vector(self, query_vector: list[float], collection_name: str, k=3):
+        vector_store = self.get_vector_store(collection_name)
+        results = vector_store.similarity_search_with_score_by_vector(embedding=query_vector, k=k)
+        return [{**doc.model_dump(), "score": score} for doc, score in results]
+
+    def query_collections(self, user_query: str, collections: dict[str, int], query_vector: Optional[list[float]] = None):
+        """
+        Embed the query once and search every collection with the same vector.
+        - collections: mapping of collection name -> k
+        - query_vector: optional precomputed embedding, skips the embedding call
+        Returns a mapping of collection name -> list of hits.
+        """
+        if query_vector is None:
+            logging.info(f"Embedding query: {user_query}")
+            query_vector = self.embed_query(user_query)
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(len(collections), 1)) as executor:
+            futures = {
+                executor.submit(self.query_by_vector, query_vector, collection_name, k): collection_name
+                for collection_name, k in collections.items()
+            }
+            for future in as_completed(futures):
+                collection_name = futures[future]
+                try:
+                    results[collection_name] = future.result()
+                except Exception as e:
+                    logging.error(f"Failed to query {collection_name}: {e}")
+                    results[collection_name] = []
+        return results
+
+    async def aembed_query(self, user_query: str) -> list[float]:
+        return await self.embedder.aembed_query(user_query)
+
+    async def aquery_collections(self, user_query: str, collections: dict[str, int], query_vector: Optional[list[float]] = None):
+        """Async counterpart of query_collections; the Qdrant searches run in worker threads."""
+        if query_vector is None:
+            logging.info(f"Embedding query: {user_query}")
+            query_vector = await self.aembed_query(user_query)
+
+        names = list(collections)
+        hits = await asyncio.gather(
+            *(asyncio.to_thread(self.query_by_vector, query_vector, name, collections[name]) for name in names),
+            return_exceptions=True,
         )
-        logging.info("Ecom Context vector store created successfully.")
+        results = {}
+        for collection_name, result in zip(names, hits):
+            if isinstance(result, Exception):
+                logging.error(f"Failed to query {collection_name}: {result}")
+                result = []
+            results[collection_name] = result
+        return results
 
     def query_qna_index(self, user_query, collection_name: str,k=3):
         logging.info(f"Querying QnA index with: {user_query}")
-        vector_store = QdrantVectorStore.from_existing_collection(
-            embedding=self.embedder,
-            collection_name=collection_name,
-            url=self.qdrant_url
-        )
-        results = vector_store.similarity_search(query=user_query, k=k)
-        return [result.model_dump() for result in results]
+        return self.query_by_vector(self.embed_query(user_query), collection_name, k)
+
+_shared_pipeline: Optional[RAGPipeline] = None
+_shared_lock = threading.Lock()
+
+def get_rag_pipeline() -> RAGPipeline:
+    """Process-wide RAGPipeline, shared by the API routes and the CLI."""
+    global _shared_pipeline
+    if _shared_pipeline is None:
+        with _shared_lock:
+            if _shared_pipeline is None:
+                _shared_pipeline = RAGPipeline()
+    return _shared_pipeline
 
 
 # if __name__ == "__main__":
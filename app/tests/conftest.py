@@ -0,0 +1,12 @@
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+# Settings are validated at import time; the tests never reach these services
+from benchmark.run import OFFLINE_ENV  # noqa: E402
+
+for key, value in OFFLINE_ENV.items():
+    os.environ.setdefault(key, value)
+os.environ["TOKEN_ENCODING"] = ""
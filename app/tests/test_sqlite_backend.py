@@ -0,0 +1,77 @@
+"""
+T-SQL date functions round-tripped through sqlglot and the SQLite backend, against the CSV exports.
+Expected values are computed from the CSV files directly, so a silent mistranslation fails here
+instead of skewing the offline benchmark.
+"""
+import os
+import csv
+import calendar
+from datetime import datetime, timezone
+import pytest
+from db_setup.sqlite_backend import SQLiteBackend, CSV_DIR
+
+
+@pytest.fixture(scope="module")
+def backend():
+    backend = SQLiteBackend()
+    yield backend
+    backend.close()
+
+
+@pytest.fixture(scope="module")
+def orders() -> dict[int, datetime]:
+    with open(os.path.join(CSV_DIR, "orders.csv"), "r", encoding="utf-8-sig", newline="") as f:
+        return {int(row["order_id"]): datetime.strptime(row["created_at"], "%m/%d/%y %H:%M") for row in csv.DictReader(f)}
+
+
+def run(backend: SQLiteBackend, query: str) -> list[tuple]:
+    with backend.connection() as conn:
+        return conn.execute(backend.prepare(query)).fetchall()
+
+
+def test_start_of_month_idiom_uses_today(backend):
+    today = datetime.now(timezone.utc)
+    rows = run(backend, "SELECT DATEADD(MONTH, DATEDIFF(MONTH, 0, GETDATE()), 0)")
+    assert rows == [(today.strftime("%Y-%m-01 00:00:00"),)]
+
+
+def test_nested_date_functions(backend, orders):
+    created = orders[1]
+    rows = run(backend, """
+        SELECT DATEADD(DAY, 1, DATEADD(MONTH, DATEDIFF(MONTH, 0, created_at), 0)),
+               DATEADD(MONTH, DATEPART(QUARTER, created_at), DATEFROMPARTS(YEAR(created_at), 1, 31))
+        FROM orders WHERE order_id = 1
+    """)
+    quarter = (created.month - 1) // 3 + 1
+    end_of_month = calendar.monthrange(created.year, 1 + quarter)[1]
+    assert rows == [(
+        created.strftime("%Y-%m-02 00:00:00"),
+        f"{created.year}-{1 + quarter:02d}-{min(31, end_of_month):02d}",
+    )]
+
+
+def test_datename(backend, orders):
+    created = orders[1]
+    rows = run(backend, """
+        SELECT DATENAME(month, created_at), DATENAME(weekday, created_at), DATENAME(quarter, created_at),
+               DATENAME(day, created_at), DATENAME(year, created_at)
+        FROM orders WHERE order_id = 1
+    """)
+    assert rows == [(
+        created.strftime("%B"), created.strftime("%A"), str((created.month - 1) // 3 + 1),
+        str(created.day), str(created.year),
+    )]
+
+
+def test_filters_match_the_csv(backend, orders):
+    march = sum(1 for created in orders.values() if created.month == 3)
+    rows = run(backend, "SELECT COUNT(*) FROM orders WHERE DATENAME(month, created_at) = 'March'")
+    assert rows == [(march,)]
+
+    first_month = min(orders.values()).replace(day=1, hour=0, minute=0)
+    in_first_month = sum(1 for created in orders.values() if created < first_month.replace(month=first_month.month + 1))
+    rows = run(backend, """
+        SELECT COUNT(*) FROM orders
+        WHERE DATEDIFF(MONTH, 0, created_at) = (SELECT MIN(DATEDIFF(MONTH, 0, created_at)) FROM orders)
+    """)
+    assert rows == [(in_first_month,)]
@@ -1,5 +1,11 @@
 from .utils import convert_json_to_toon
+from .toon import encode_toon, iter_toon_table, decode_toon
+from .tokens import count_tokens
 
 __all__ = [
     "convert_json_to_toon",
+    "encode_toon",
+    "iter_toon_table",
+    "decode_toon",
+    "count_tokens",
 ]
@@ -0,0 +1,36 @@
+import logging
+import threading
+from src.config import settings
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """
+    tiktoken encoding named by TOKEN_ENCODING, loaded once.
+    None when TOKEN_ENCODING is empty, or tiktoken or its BPE file is unavailable (e.g. offline).
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                if settings.TOKEN_ENCODING:
+                    try:
+                        import tiktoken
+                        _encoding = tiktoken.get_encoding(settings.TOKEN_ENCODING)
+                    except Exception as e:
+                        logging.warning(f"tiktoken unavailable, estimating tokens from length: {e}")
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Token count of text with the TOKEN_ENCODING encoding, or a ~4 characters per token estimate."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,343 @@
+import re
+import json
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Iterable, Iterator, List, Optional, Sequence
+
+# ─── Encoder ────────────────────────────────────────────────────────
+# Same output as utils.json_to_toon, written into one list of lines that is joined once.
+
+_SPECIAL = re.compile(r'[,\n\r"]')
+
+
+def _is_primitive(x) -> bool:
+    return x is None or isinstance(x, (str, int, float, bool))
+
+
+def _quote(s: str) -> str:
+    return '"' + s.replace('"', '\\"') + '"'
+
+
+def _format_str(s: str) -> str:
+    # Quote empty strings, leading/trailing whitespace, delimiters, newlines and quotes
+    if not s or s[0].isspace() or s[-1].isspace() or _SPECIAL.search(s):
+        return _quote(s)
+    return s
+
+
+def _format_other(v: Any) -> str:
+    if v is None:
+        return "null"
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if isinstance(v, (int, float)):
+        return str(v)
+    if isinstance(v, str):
+        return _format_str(v)
+    # Objects/arrays where a primitive is expected travel as quoted compact JSON
+    return _quote(json.dumps(v, separators=(",", ":")))
+
+
+# Exact-type dispatch for the common cells; subclasses and everything else go through _format_other
+_FORMATTERS = {
+    str: _format_str,
+    int: str,
+    float: str,
+    bool: lambda v: "true" if v else "false",
+    type(None): lambda v: "null",
+}
+
+
+def _format(v: Any) -> str:
+    return _FORMATTERS.get(type(v), _format_other)(v)
+
+
+def _table_keys(lst: list) -> Optional[List]:
+    """Shared keys (in order) when every element is a dict with the same keys in the same order, else None."""
+    first = lst[0]
+    if not isinstance(first, dict):
+        return None
+    keys = tuple(first)
+    for el in lst:
+        # A tuple of the keys is the cheapest ordered comparison a dict offers
+        if not isinstance(el, dict) or tuple(el) != keys:
+            return None
+    return list(keys)
+
+
+_NUMERIC = {int, float}
+# Rows formatted per chunk by the streaming table encoder
+_CHUNK_ROWS = 1024
+
+
+def _format_column(values: Sequence) -> Iterable[str]:
+    """Format one column at once: numbers through str, plain strings as they are, the rest per cell."""
+    kinds = set(map(type, values))
+    if kinds <= _NUMERIC:
+        return map(str, values)
+    if kinds == {str} and not _SPECIAL.search("\x00".join(values)) and not any(
+        not v or v[0].isspace() or v[-1].isspace() for v in values
+    ):
+        return values
+    return map(_format, values)
+
+
+def _format_rows(columns: List[Sequence]) -> Iterator[str]:
+    """Row lines of a table given column-wise."""
+    return map(",".join, zip(*[_format_column(values) for values in columns]))
+
+
+def _write_rows(out: List[str], pad: str, columns: List[Sequence]):
+    lines = _format_rows(columns)
+    out.extend(map(pad.__add__, lines) if pad else lines)
+
+
+def _write_list(out: List[str], name: str, lst: list, indent: int, pad: str):
+    size = len(lst)
+    if not size:
+        out.append(f"{pad}{name}[0]:")
+        return
+
+    keys = _table_keys(lst)
+    if keys is not None:
+        out.append(f"{pad}{name}[{size}]{{{','.join(keys)}}}:")
+        if not keys:
+            out.extend(pad for _ in lst)
+        elif len(keys) == 1:
+            key = keys[0]
+            _write_rows(out, pad, [[item[key] for item in lst]])
+        else:
+            _write_rows(out, pad, list(zip(*map(itemgetter(*keys), lst))))
+    elif all(_is_primitive(el) for el in lst):
+        out.append(f"{pad}{name}[{size}]: {','.join(map(_format, lst))}")
+    else:
+        out.append(f"{pad}{name}[{size}]:")
+        child = " " * (indent + 2)
+        for el in lst:
+            if _is_primitive(el):
+                out.append(child + _format(el))
+            else:
+                _write_node(out, el, indent + 2)
+
+
+def _write_dict(out: List[str], data: dict, indent: int, pad: str):
+    for k, v in data.items():
+        if isinstance(v, dict):
+            out.append(f"{pad}{k}:")
+            _write_node(out, v, indent + 2)
+        elif isinstance(v, list):
+            _write_list(out, k, v, indent, pad)
+        else:
+            out.append(f"{pad}{k}: {_format(v)}")
+
+
+def _write_node(out: List[str], data: Any, indent: int):
+    pad = " " * indent
+    if isinstance(data, dict):
+        start = len(out)
+        _write_dict(out, data, indent, pad)
+        if len(out) == start:
+            # An empty nested object still takes its (blank) line
+            out.append("")
+    elif isinstance(data, list):
+        _write_list(out, "", data, indent, pad)
+    elif _is_primitive(data):
+        out.append(pad + _format(data))
+    else:
+        out.append(f'{pad}"{json.dumps(data, separators=(",", ":"))}"')
+
+
+def encode_toon(data: Any) -> str:
+    """Encode a Python object (dict/list/primitive, as from json.loads) as TOON."""
+    out: List[str] = []
+    _write_node(out, data, 0)
+    return "\n".join(out)
+
+
+def iter_toon_table(name: str, columns: Sequence[str], rows: Iterable[Sequence], count: Optional[int] = None) -> Iterator[str]:
+    """
+    Encode DB rows as a TOON tabular array, one line at a time: the header, then one line per row.
+    Same text as encode_toon({name: [dict(zip(columns, row)), ...]}) for distinct column names,
+    without building the row dicts or holding the whole encoding.
+    - count: number of rows, required when rows has no len() (the header carries it)
+    """
+    if count is None:
+        count = len(rows)  # type: ignore[arg-type]
+    if not count:
+        yield f"{name}[0]:"
+        return
+    yield f"{name}[{count}]{{{','.join(columns)}}}:"
+    if not columns:
+        for _ in rows:
+            yield ""
+        return
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, _CHUNK_ROWS))
+        if not chunk:
+            return
+        yield from _format_rows(list(zip(*chunk)))
+
+
+# ─── Decoder ────────────────────────────────────────────────────────
+# Reads what the encoder writes. Lossy where the format is: unquoted strings that look like
+# numbers/booleans/null come back as those, and nested structures inside cells come back as strings.
+
+_HEADER = re.compile(r"^(?P<name>[^\[:]*)\[(?P<size>\d+)\](?:\{(?P<keys>[^}]*)\})?:(?: (?P<values>.*))?$", re.S)
+
+
+def _logical_lines(text: str) -> List[tuple]:
+    """(indent, content) per line; newlines inside quoted strings don't end a line."""
+    lines, start, quoted, i = [], 0, False, 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\" and quoted:
+            i += 2
+            continue
+        if ch == '"':
+            quoted = not quoted
+        elif ch == "\n" and not quoted:
+            lines.append(text[start:i])
+            start = i + 1
+        i += 1
+    lines.append(text[start:])
+    return [(len(line) - len(line.lstrip(" ")), line.lstrip(" ")) for line in lines]
+
+
+def _split_values(text: str) -> List[str]:
+    values, start, quoted, i = [], 0, False, 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\" and quoted:
+            i += 2
+            continue
+        if ch == '"':
+            quoted = not quoted
+        elif ch == "," and not quoted:
+            values.append(text[start:i])
+            start = i + 1
+        i += 1
+    values.append(text[start:])
+    return values
+
+
+def _parse_value(token: str) -> Any:
+    if len(token) >= 2 and token[0] == '"' and token[-1] == '"':
+        return token[1:-1].replace('\\"', '"')
+    if token == "null":
+        return None
+    if token in ("true", "false"):
+        return token == "true"
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+class _Reader:
+    def __init__(self, text: str):
+        self.lines = _logical_lines(text)
+        self.pos = 0
+
+    def peek(self) -> Optional[tuple]:
+        return self.lines[self.pos] if self.pos < len(self.lines) else None
+
+    def next(self) -> tuple:
+        line = self.lines[self.pos]
+        self.pos += 1
+        return line
+
+    def read_list(self, match: re.Match, indent: int) -> list:
+        size = int(match.group("size"))
+        if match.group("values") is not None:
+            return [_parse_value(v) for v in _split_values(match.group("values"))]
+        if match.group("keys") is not None:
+            keys = match.group("keys").split(",") if match.group("keys") else []
+            rows = []
+            for _ in range(size):
+                _, content = self.next()
+                values = [_parse_value(v) for v in _split_values(content)] if keys else []
+                rows.append(dict(zip(keys, values)))
+            return rows
+
+        items = []
+        while len(items) < size:
+            line = self.peek()
+            if line is not None and not line[1]:
+                # Blank line left by an empty object element
+                self.next()
+                items.append({})
+                continue
+            if line is None or line[0] < indent + 2:
+                break
+            child_indent, content = line
+            header = _HEADER.match(content)
+            if header and not header.group("name"):
+                self.next()
+                items.append(self.read_list(header, child_indent))
+            elif self._is_key_line(content):
+                items.append(self.read_dict(child_indent, split_on_repeat=True))
+            else:
+                self.next()
+                items.append(_parse_value(content))
+        if len(items) != size:
+            raise ValueError(f"Expected {size} list items, found {len(items)} (ambiguous list of objects)")
+        return items
+
+    @staticmethod
+    def _is_key_line(content: str) -> bool:
+        if content.startswith('"'):
+            return False
+        return bool(_HEADER.match(content)) or ": " in content or content.endswith(":")
+
+    def read_dict(self, indent: int, split_on_repeat: bool = False) -> dict:
+        result: dict = {}
+        while True:
+            line = self.peek()
+            if line is None:
+                break
+            line_indent, content = line
+            if line_indent != indent or not content:
+                break
+            header = _HEADER.match(content)
+            if (header and not header.group("name")) or not self._is_key_line(content):
+                # An unnamed array or a bare value: the next list item, not one of this object's keys
+                break
+            key = header.group("name") if header else content.split(":", 1)[0]
+            if split_on_repeat and key in result:
+                break
+            self.next()
+            if header and header.group("name"):
+                result[key] = self.read_list(header, indent)
+            elif content.endswith(":") and ": " not in content:
+                nxt = self.peek()
+                if nxt is not None and not nxt[1]:
+                    # Blank line left by an empty nested object
+                    self.next()
+                    result[key] = {}
+                elif nxt is not None and nxt[0] > indent:
+                    result[key] = self.read_dict(nxt[0])
+                else:
+                    result[key] = {}
+            else:
+                result[key] = _parse_value(content.split(": ", 1)[1])
+        return result
+
+
+def decode_toon(text: str) -> Any:
+    """Parse TOON written by encode_toon back into Python objects (see the lossy cases above)."""
+    reader = _Reader(text)
+    first = reader.peek()
+    if first is None or (len(reader.lines) == 1 and not first[1]):
+        return {}
+    header = _HEADER.match(first[1])
+    if header and not header.group("name"):
+        reader.next()
+        return reader.read_list(header, first[0])
+    if len(reader.lines) == 1 and not reader._is_key_line(first[1]):
+        return _parse_value(first[1])
+    return reader.read_dict(first[0])
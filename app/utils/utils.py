@@ -1,6 +1,7 @@
 import json
 from collections import OrderedDict
 from typing import Any, List, Dict, Tuple
+from .toon import encode_toon
 
 def _is_primitive(x):
     return x is None or isinstance(x, (str, int, float, bool))
@@ -176,7 +177,7 @@ def convert_json_to_toon(obj_or_json: Any) -> str:
         parsed = json.loads(obj_or_json)
     else:
         parsed = obj_or_json
-    # If top-level is a dict, we convert directly
-    return json_to_toon(parsed)
+    # Single-buffer encoder with the same output as json_to_toon (kept as the reference implementation)
+    return encode_toon(parsed)
 
 # -------------------------
\ No newline at end of file
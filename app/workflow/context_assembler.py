@@ -0,0 +1,126 @@
+import re
+from typing import Optional
+from workflow.helper import parse_chunk_content
+from utils import convert_json_to_toon, count_tokens
+
+# Sections each agent reads. SQLAgent gets the QnA pairs as few-shot examples instead.
+AGENT_SECTIONS = {
+    "planner": ("tables", "metrics", "examples"),
+    "sql": ("tables", "metrics"),
+    "healer": ("tables", "metrics"),
+}
+
+
+def _metric_key(value: str) -> str:
+    return value.lower().removeprefix("metric:")
+
+
+def _normalize_text(value: str) -> str:
+    return re.sub(r"\s+", " ", value).strip().rstrip(";").lower()
+
+
+class ContextItem:
+    def __init__(self, section: str, key: str, score: float, fields: dict):
+        self.section = section
+        self.key = key
+        self.score = score
+        self.fields = fields
+        self.tokens = count_tokens(",".join(str(v) for v in fields.values())) + 1
+
+
+class ContextAssembler:
+    """
+    Builds the database context sent to each agent from the retrieval hits.
+    - Chunks are parsed back into fields; only the fields the prompts use are kept
+      (table descriptions, metric definitions, example question/SQL pairs).
+    - Duplicate tables, metrics and examples are dropped, as are examples whose metric
+      is already defined in the metrics section.
+    - Each agent's context is filled in retrieval-score order up to its token budget;
+      the best hit of every section goes in first so no section is starved.
+    """
+
+    def __init__(self, budgets: dict[str, int]):
+        self.budgets = budgets
+
+    def assemble(self, retrieval_results: dict) -> dict[str, str]:
+        items = self._collect(retrieval_results)
+        return {
+            agent: self._render(self._fit(items, sections, self.budgets.get(agent, 0)))
+            for agent, sections in AGENT_SECTIONS.items()
+        }
+
+    def _collect(self, retrieval_results: dict) -> list[ContextItem]:
+        items, seen = [], set()
+
+        def add(item: ContextItem):
+            if item.key in seen:
+                return
+            seen.add(item.key)
+            items.append(item)
+
+        for doc in retrieval_results.get("db", []):
+            parsed = parse_chunk_content(doc.get("page_content", ""))
+            table = doc.get("metadata", {}).get("table") or parsed.get("id", "").removeprefix("table:")
+            if not table or not parsed.get("text"):
+                continue
+            add(ContextItem("tables", f"table:{table.lower()}", doc.get("score", 0.0), {
+                "table": table, "description": parsed["text"],
+            }))
+
+        for doc in retrieval_results.get("business", []):
+            parsed = parse_chunk_content(doc.get("page_content", ""))
+            name = parsed.get("id") or parsed.get("name")
+            if not name:
+                continue
+            add(ContextItem("metrics", f"metric:{_metric_key(name)}", doc.get("score", 0.0), {
+                "name": parsed.get("name", name),
+                "description": parsed.get("description", ""),
+                "formula_sql": parsed.get("formula_sql", ""),
+                "tables": " ".join(parsed.get("tables", [])),
+            }))
+
+        for doc in retrieval_results.get("qna", []):
+            parsed = parse_chunk_content(doc.get("page_content", ""))
+            question, sql = parsed.get("question", ""), parsed.get("sql_query", "")
+            if not question or not sql:
+                continue
+            metric_id = doc.get("metadata", {}).get("metric_id")
+            if metric_id and f"metric:{_metric_key(metric_id)}" in seen:
+                continue
+            if f"sql:{_normalize_text(sql)}" in seen:
+                continue
+            seen.add(f"sql:{_normalize_text(sql)}")
+            add(ContextItem("examples", f"question:{_normalize_text(question)}", doc.get("score", 0.0), {
+                "question": question, "sql": sql,
+            }))
+
+        return items
+
+    @staticmethod
+    def _fit(items: list[ContextItem], sections: tuple, budget: int) -> list[ContextItem]:
+        candidates = sorted((i for i in items if i.section in sections), key=lambda i: i.score, reverse=True)
+        leaders = {}
+        for item in candidates:
+            leaders.setdefault(item.section, item)
+        ordered = list(leaders.values()) + [i for i in candidates if i not in leaders.values()]
+
+        chosen, used = [], 0
+        for item in ordered:
+            if budget and used + item.tokens > budget:
+                continue
+            chosen.append(item)
+            used += item.tokens
+        return chosen
+
+    @staticmethod
+    def _render(items: list[ContextItem]) -> str:
+        sections = {}
+        for item in sorted(items, key=lambda i: i.score, reverse=True):
+            sections.setdefault(item.section, []).append(item.fields)
+        ordered = {name: sections[name] for name in ("tables", "metrics", "examples") if name in sections}
+        return convert_json_to_toon(ordered) if ordered else ""
+
+
+def assemble_context(retrieval_results: dict, budgets: Optional[dict[str, int]] = None) -> dict[str, str]:
+    """Per-agent context strings keyed by agent name (see AGENT_SECTIONS)."""
+    return ContextAssembler(budgets or {}).assemble(retrieval_results)
@@ -1,6 +1,20 @@
+import ast
 import json
 import sqlglot
 import sqlglot.errors
+from typing import Iterator, Optional
+from schema import SqlResponse
+from workflow.result_transport import iter_result_frames
+
+def parse_chunk_content(content) -> dict:
+    """Chunks are indexed as the str() of their dict, turn page_content back into that dict."""
+    if not isinstance(content, str) or not content.startswith("{"):
+        return {}
+    try:
+        parsed = ast.literal_eval(content)
+    except (ValueError, SyntaxError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
 
 def extract_few_shot_examples(qna_results: list, max_examples: int = 3) -> str:
     """
@@ -9,12 +23,7 @@ def extract_few_shot_examples(qna_results: list, max_examples: int = 3) -> str:
     """
     examples = []
     for doc in qna_results:
-        content = doc.get("page_content", "")
-        # Parse the stringified dict back if needed
-        try:
-            parsed = eval(content) if isinstance(content, str) and content.startswith("{") else {}
-        except Exception:
-            parsed = {}
+        parsed = parse_chunk_content(doc.get("page_content", ""))
 
         sql = parsed.get("sql_query", "")
         question = parsed.get("question", "")
@@ -31,6 +40,27 @@ def extract_few_shot_examples(qna_results: list, max_examples: int = 3) -> str:
     return header + "\n\n".join(examples)
 
 
+def match_verified_sql(qna_results: list, threshold: float) -> Optional[SqlResponse]:
+    """
+    Return the stored SQL of the best QnA hit when its similarity score clears the threshold.
+    Used to skip rewrite/plan/generate for questions already in the knowledge base.
+    """
+    if not qna_results:
+        return None
+    best = max(qna_results, key=lambda doc: doc.get("score", 0.0))
+    if best.get("score", 0.0) < threshold:
+        return None
+
+    parsed = parse_chunk_content(best.get("page_content", ""))
+    sql = parsed.get("sql_query", "")
+    if not sql:
+        return None
+    return SqlResponse(
+        query=sql,
+        explanation=f"Verified SQL reused from knowledge base question: {parsed.get('question', '')}"
+    )
+
+
 def check_sql_syntax(sql: str) -> str | None:
     """Run sqlglot syntax check. Returns error string or None if clean."""
     try:
@@ -39,10 +69,9 @@ def check_sql_syntax(sql: str) -> str | None:
     except sqlglot.errors.ParseError as e:
         return str(e.errors)
 
-def format_json_results(data):
-    """Format dicts/lists for display or further processing."""
-    if isinstance(data, list):
-        data = [obj.dict() if hasattr(obj, "dict") else obj for obj in data]
-    elif hasattr(data, "dict"):
-        data = data.dict()
-    return data
+def format_json_results(data: dict, batch_size: Optional[int] = None, encoding: str = "json") -> Iterator[dict]:
+    """
+    A query result as JSON-safe frames for clients: a typed column header, then columnar row batches.
+    See iter_result_frames for the frame layout.
+    """
+    return iter_result_frames(data, batch_size=batch_size, encoding=encoding)
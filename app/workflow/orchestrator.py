@@ -0,0 +1,175 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Iterator, Optional
+from workflow.rag_pipeline import (
+    aembed_question,
+    lookup_cached_answer,
+    cache_answer,
+    afind_verified_sql,
+    arewrite_user_query,
+    aretrieve_context_parallel,
+    prepare_context_and_examples,
+    acreate_sql_plan,
+    agenerate_sql_query,
+    avalidate_generated_sql,
+    aexecute_and_heal_sql,
+    aanalyze_sql_results,
+    astream_sql_results_analysis
+)
+from src.rag import get_rag_pipeline
+from db_setup.db import SQLDB
+from db_setup.result_cache import get_result_cache
+from db_setup.query_guard import get_query_guard
+from workflow.helper import format_json_results
+from workflow.single_flight import normalize_question
+from src.metrics import StageTimer
+
+
+def _result_updates(data: dict, timer: StageTimer, encoding: str) -> Iterator[dict]:
+    """The result as a "data" update (typed column header) followed by one "rows" update per columnar batch."""
+    frames = format_json_results(data, encoding=encoding)
+    yield {"status": "Data retrieved successfully", "data": next(frames), **timer.fields()}
+    for batch in frames:
+        yield {"status": "Data retrieved successfully", "rows": batch}
+
+
+async def run_pipeline(question: str, stream_analysis: bool = True, encoding: str = "json") -> AsyncIterator[dict]:
+    """
+    Main Pipeline Orchestration, shared by the API and the CLI.
+    LLM calls are awaited and DB work runs on a bounded executor, so the event loop
+    can hold many questions in flight at once.
+    Yields dicts with 'status' and optionally 'step', 'path', 'sql', 'data' (result column header),
+    'rows' (columnar row batches, JSON or base64 Arrow IPC per encoding), 'token' (analysis text as it is
+    generated, with stream_analysis), 'error' or 'analysis', plus stage timings.
+    """
+    rag = get_rag_pipeline()
+    db = SQLDB(result_cache=get_result_cache(), guard=get_query_guard())
+    timer = StageTimer()
+
+    yield {"status": "Starting pipeline...", "step": 0, **timer.fields()}
+
+    # Semantic cache: serve near-identical questions without running the pipeline
+    with timer.stage("embed_question"):
+        question_vector = await aembed_question(question, rag)
+    with timer.stage("semantic_cache"):
+        # Similarity scan and SQLite writes are blocking, keep them off the event loop
+        cached = await asyncio.to_thread(lookup_cached_answer, question, question_vector)
+    if cached is not None:
+        timer.finish()
+        yield {"status": "Answer served from semantic cache", "step": 0.5, "path": "cache", "sql": cached["sql"], **timer.fields()}
+        for update in _result_updates(cached["data"], timer, encoding):
+            yield update
+        yield {"status": "Pipeline completed", "analysis": cached["analysis"], **timer.fields()}
+        return
+
+    # Fast path: reuse verified SQL from the QnA knowledge base
+    data = None
+    with timer.stage("verified_sql_lookup"):
+        verified_sql = await afind_verified_sql(question, rag, question_vector)
+    if verified_sql is not None:
+        yield {"status": "Matched verified SQL, skipping generation...", "step": 0.5, "path": "fast", "sql": verified_sql.query, **timer.fields()}
+        with timer.stage("fast_execute"):
+            data, error = await aexecute_and_heal_sql(question, verified_sql, db, context="", max_retries=1)
+        if error:
+            data = None
+            yield {"status": "Verified SQL failed, running full pipeline...", "step": 0.5, "path": "full", **timer.fields()}
+    else:
+        yield {"status": "No verified SQL match, running full pipeline...", "step": 0.5, "path": "full", **timer.fields()}
+
+    if data is None:
+        # Step 1: Rewrite
+        yield {"status": "Rewriting query...", "step": 1, **timer.fields()}
+        with timer.stage("rewrite"):
+            rewritten_q = await arewrite_user_query(question)
+
+        # Step 2: Parallel RAG
+        yield {"status": "Retrieving context and examples...", "step": 2, **timer.fields()}
+        with timer.stage("retrieve"):
+            # The question's embedding serves retrieval too, unless the rewrite actually changed the question
+            same = question_vector is not None and normalize_question(rewritten_q) == normalize_question(question)
+            retrieval_results = await aretrieve_context_parallel(rewritten_q, rag, question_vector if same else None)
+
+        # Step 3: Context Assembly
+        yield {"status": "Assembling context...", "step": 3, **timer.fields()}
+        with timer.stage("assemble_context"):
+            contexts, few_shots = prepare_context_and_examples(retrieval_results)
+
+        # Step 4: Query Planning
+        yield {"status": "Creating SQL plan...", "step": 4, **timer.fields()}
+        with timer.stage("plan"):
+            plan = await acreate_sql_plan(question, contexts["planner"])
+
+        # Step 5: SQL Generation
+        yield {"status": "Generating SQL query...", "step": 5, **timer.fields()}
+        with timer.stage("generate_sql"):
+            sql_response = await agenerate_sql_query(question, contexts["sql"], few_shots, plan)
+
+        # Step 6: Smart Validation
+        yield {"status": "Validating SQL...", "step": 6.1, **timer.fields()}
+        with timer.stage("validate"):
+            validated_response = await avalidate_generated_sql(question, sql_response, contexts["sql"])
+
+        if hasattr(validated_response, "query"):
+            yield {"status": "SQL generated successfully", "step": 6.2, "sql": validated_response.query, **timer.fields()}
+
+        # Step 7: Execution & Healing
+        yield {"status": "Executing SQL engine...", "step": 7, **timer.fields()}
+        with timer.stage("execute"):
+            data, error = await aexecute_and_heal_sql(question, validated_response, db, contexts["healer"])
+
+        if error:
+            timer.finish()
+            yield {"status": "Pipeline failed", "error": str(error), **timer.fields()}
+            return
+
+    for update in _result_updates(data, timer, encoding):
+        yield update
+
+    # Step 8: Data Analysis
+    yield {"status": "Analyzing results...", "step": 8, **timer.fields()}
+    with timer.stage("analyze"):
+        if stream_analysis:
+            chunks = []
+            async for chunk in astream_sql_results_analysis(question, data):
+                if not chunks:
+                    timer.mark("analysis_first_token")
+                chunks.append(chunk)
+                yield {"status": "Analyzing results...", "token": chunk}
+            analysis = "".join(chunks)
+        else:
+            analysis = (await aanalyze_sql_results(question, data)).content
+    await asyncio.to_thread(cache_answer, question, question_vector, data, analysis)
+
+    timer.finish()
+    yield {"status": "Pipeline completed", "analysis": analysis, **timer.fields()}
+
+
+# ─── Synchronous driver ───────────────────────────────────────────
+# One event loop in a background thread for the whole process, so the async LLM and HTTP clients
+# stay bound to a single loop across questions (and across threads, e.g. the benchmark's workers).
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def _pipeline_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="pipeline-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+def iter_pipeline(question: str, stream_analysis: bool = True, encoding: str = "json") -> Iterator[dict]:
+    """run_pipeline as a plain generator for synchronous callers (the CLI and the benchmark)."""
+    loop = _pipeline_loop()
+    updates = run_pipeline(question, stream_analysis=stream_analysis, encoding=encoding)
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(updates.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(updates.aclose(), loop).result()
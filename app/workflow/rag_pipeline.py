@@ -1,8 +1,16 @@
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from workflow.helper import extract_few_shot_examples, check_sql_syntax
+import asyncio
+import logging
+import threading
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from workflow.helper import extract_few_shot_examples, check_sql_syntax, match_verified_sql
+from workflow.semantic_cache import get_semantic_cache
+from workflow.result_summary import summarize_result
+from workflow.context_assembler import assemble_context
 from src.rag import RAGPipeline
 from db_setup.db import SQLDB
+from db_setup.schema_catalog import get_schema_catalog
 from src.llm import (
     SQLAgent,
     DataAnalystAgent,
@@ -11,7 +19,8 @@ from src.llm import (
     QueryPlannerAgent,
     SelfHealerAgent,
 )
-from utils import convert_json_to_toon
+from src.config import settings
+from src.metrics import SQL_ATTEMPTS, SQL_ROWS, HEAL_CANDIDATE_RESULTS
 
 
 # Singletons
@@ -22,44 +31,41 @@ query_validator = QueryValidatorAgent()
 self_healer = SelfHealerAgent()
 data_analyst = DataAnalystAgent()
 
-def rewrite_user_query(question: str):
-    return query_rewriter.rewrite(question)
-
-def retrieve_context_parallel(question: str, rag: RAGPipeline):
-    results = {}
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        futures = {
-            executor.submit(rag.query_qna_index, question, "db"): "db",
-            executor.submit(rag.query_qna_index, question, "business_logic", 2): "business",
-            executor.submit(rag.query_qna_index, question, "qna", 3): "qna",
-        }
-        for future in as_completed(futures):
-            key = futures[future]
-            try:
-                results[key] = future.result()
-            except Exception:
-                results[key] = []
-    return results
+# The pipeline steps are async only; the CLI and the benchmark drive them through workflow.orchestrator
 
-def prepare_context_and_examples(retrieval_results: dict):
-    db_results = retrieval_results.get("db", [])
-    business_results = retrieval_results.get("business", [])
-    qna_results = retrieval_results.get("qna", [])
+# Bounded pool for blocking DB work issued from the async pipeline
+db_executor = ThreadPoolExecutor(max_workers=settings.DB_EXECUTOR_WORKERS, thread_name_prefix="sqldb")
 
-    toon_db = convert_json_to_toon(db_results)
-    toon_business = convert_json_to_toon(business_results)
-    toon_qna = convert_json_to_toon(qna_results)
+def lookup_cached_answer(question: str, question_vector):
+    cache = get_semantic_cache()
+    if cache is None:
+        return None
+    return cache.lookup(question_vector, question)
 
-    combined_context = toon_db + toon_business + toon_qna
-    few_shots = extract_few_shot_examples(qna_results)
+def cache_answer(question: str, question_vector, data: dict, analysis: str):
+    cache = get_semantic_cache()
+    if cache is None or not data:
+        return
+    cache.store(question, question_vector, data.get("sql", ""), data, analysis)
 
-    return combined_context, few_shots
+# Result key -> (collection name, k)
+RETRIEVAL_PLAN = {
+    "db": ("db", 3),
+    "business": ("business_logic", 2),
+    "qna": ("qna", 3),
+}
 
-def create_sql_plan(question: str, context: str):
-    return query_planner.plan(question, context)
+def prepare_context_and_examples(retrieval_results: dict):
+    """
+    Deduplicated, token-budgeted context per agent ({"planner", "sql", "healer"} -> TOON string)
+    plus the few-shot examples for SQLAgent.
+    """
+    contexts = assemble_context(retrieval_results, settings.CONTEXT_TOKEN_BUDGETS)
+    few_shots = extract_few_shot_examples(retrieval_results.get("qna", []))
+    return contexts, few_shots
 
-def generate_sql_query(question: str, context: str, few_shots: str, plan):
-    enriched_prompt = (
+def _build_sql_prompt(question: str, context: str, few_shots: str, plan) -> str:
+    return (
         f"Question: {question}\n\n"
         f"Context:\n{context}\n\n"
         f"Query Plan:\n{plan.full_plan}\n"
@@ -71,43 +77,250 @@ def generate_sql_query(question: str, context: str, few_shots: str, plan):
         f"Computed Columns: {plan.computed_columns}"
         f"{few_shots}"
     )
-    return sql_agent.sql_agent(enriched_prompt)
 
-def validate_generated_sql(question: str, sql_response, context: str):
+def check_sql_against_catalog(sql: str):
+    """Unknown table/column or ambiguity error from the cached schema catalog, None when the SQL resolves."""
+    catalog = get_schema_catalog()
+    return catalog.validate(sql) if catalog is not None else None
+
+class EmptyResult(Exception):
+    """A query that ran but returned no rows; keeps the result in case no candidate does better."""
+
+    def __init__(self, data: dict):
+        super().__init__("Query returned no rows.")
+        self.data = data
+
+def _ensure_not_empty(data: dict, require_rows: bool = False):
+    """
+    Raise when the query failed or returned nothing.
+    - require_rows: also reject a result that has columns but no rows (heal-race winners must return rows)
+    """
+    if data.get("error"):
+        raise Exception(data["error"])
+    rows = data.get("rows", [])
+    columns = data.get("columns", [])
+
+    if not rows and not columns:
+        raise Exception("Query returned EMPTY results.")
+    if require_rows and (not rows or data.get("row_count") == 0):
+        raise EmptyResult(data)
+
+# Repair instructions cycled across the parallel healer candidates, so they don't all propose the same fix
+HEAL_STRATEGIES = (
+    "",
+    "Make the smallest change to the failed SQL that fixes the error.",
+    "Rewrite the query from the question and the database context instead of patching the failed SQL.",
+)
+
+_candidate_healers: Optional[list[SelfHealerAgent]] = None
+_candidate_lock = threading.Lock()
+
+def _heal_candidates() -> list[SelfHealerAgent]:
+    """HEAL_CANDIDATES healers, each with its own temperature and repair strategy. Built on first use."""
+    global _candidate_healers
+    if _candidate_healers is None:
+        with _candidate_lock:
+            if _candidate_healers is None:
+                temperatures = settings.HEAL_CANDIDATE_TEMPERATURES
+                healers = []
+                for i in range(settings.HEAL_CANDIDATES):
+                    params = {"temperature": temperatures[i % len(temperatures)]} if temperatures else {}
+                    healers.append(SelfHealerAgent(strategy=HEAL_STRATEGIES[i % len(HEAL_STRATEGIES)], **params))
+                _candidate_healers = healers
+    return _candidate_healers
+
+class CandidateFailed(Exception):
+    """
+    A candidate query that was rejected by the static checks or failed/returned nothing on the database.
+    - data: the zero-row result of a query that ran ("empty"), used when no candidate returns rows
+    """
+
+    def __init__(self, sql: str, error: str, result: str, data: Optional[dict] = None):
+        super().__init__(error)
+        self.sql = sql
+        self.error = error
+        self.result = result
+        self.data = data
+
+def _empty_fallback(failures: list[CandidateFailed]) -> Optional[dict]:
+    return next((f.data for f in failures if f.data is not None), None)
+
+def _static_error(sql: str):
+    return check_sql_syntax(sql) or check_sql_against_catalog(sql)
+
+def summarize_for_analyst(data: dict) -> str:
+    """Token-budgeted TOON summary of the result (stats, top values, time series, sample) for the analyst."""
+    return summarize_result(
+        data,
+        token_budget=settings.ANALYST_TOKEN_BUDGET,
+        sample_rows=settings.ANALYST_SAMPLE_ROWS,
+        top_k=settings.ANALYST_TOP_K,
+    )
+
+async def aembed_question(question: str, rag: RAGPipeline):
+    """Embed the raw question once; the vector feeds the semantic cache and the verified-SQL fast path."""
+    if not settings.SEMANTIC_CACHE_ENABLED and settings.QNA_FAST_PATH_THRESHOLD <= 0:
+        return None
+    try:
+        return await rag.aembed_query(question)
+    except Exception as e:
+        logging.error(f"Question embedding failed: {e}")
+        return None
+
+async def afind_verified_sql(question: str, rag: RAGPipeline, query_vector=None):
+    """Fast path: stored QnA SQL for a near-identical question, or None (disabled when the threshold is 0)."""
+    threshold = settings.QNA_FAST_PATH_THRESHOLD
+    if threshold <= 0:
+        return None
+    try:
+        hits = await rag.aquery_collections(question, {"qna": 1}, query_vector=query_vector)
+    except Exception as e:
+        logging.error(f"Verified SQL lookup failed: {e}")
+        return None
+    return match_verified_sql(hits.get("qna", []), threshold)
+
+async def arewrite_user_query(question: str):
+    return await query_rewriter.arewrite(question)
+
+async def aretrieve_context_parallel(question: str, rag: RAGPipeline, query_vector=None):
+    collections = {collection: k for collection, k in RETRIEVAL_PLAN.values()}
+    try:
+        hits = await rag.aquery_collections(question, collections, query_vector=query_vector)
+    except Exception as e:
+        logging.error(f"Context retrieval failed: {e}")
+        hits = {}
+    return {key: hits.get(collection, []) for key, (collection, _k) in RETRIEVAL_PLAN.items()}
+
+async def acreate_sql_plan(question: str, context: str):
+    return await query_planner.aplan(question, context)
+
+async def agenerate_sql_query(question: str, context: str, few_shots: str, plan):
+    enriched_prompt = _build_sql_prompt(question, context, few_shots, plan)
+    return await sql_agent.asql_agent(enriched_prompt)
+
+async def avalidate_generated_sql(question: str, sql_response, context: str):
     if not hasattr(sql_response, "query"):
         return sql_response
 
     syntax_error = check_sql_syntax(sql_response.query)
+    if syntax_error is None:
+        syntax_error = await asyncio.to_thread(check_sql_against_catalog, sql_response.query)
     if syntax_error is None:
         return sql_response
 
-    return query_validator.validate_query(
+    return await query_validator.avalidate_query(
         f"Question: {question}\n SQL Error: {syntax_error}",
         sql_response.query
     )
 
-def execute_and_heal_sql(question: str, sql_response, db: SQLDB, context: str, max_retries: int = 3):
+async def arun_query(db: SQLDB, sql: str):
+    """Run a blocking SQLDB query on the bounded DB executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, db.query_db, sql)
+
+async def _atry_candidate(sql: str, db: SQLDB) -> dict:
+    error = await asyncio.to_thread(_static_error, sql)
+    if error:
+        raise CandidateFailed(sql, error, "rejected")
+    try:
+        data = await arun_query(db, sql)
+        data["sql"] = sql
+        _ensure_not_empty(data, require_rows=True)
+    except EmptyResult as e:
+        raise CandidateFailed(sql, str(e), "empty", e.data) from e
+    except Exception as e:
+        raise CandidateFailed(sql, str(e), "failed") from e
+    return data
+
+async def _arace_heal(question: str, failed: CandidateFailed, db: SQLDB, context: str):
+    """
+    One self-heal round: every candidate healer repairs the failed query concurrently and its SQL runs as soon
+    as it arrives. The first result with rows wins and the other candidates are cancelled.
+    Returns (data, failures); data is None when all failed.
+    """
+    async def candidate(healer: SelfHealerAgent):
+        healed = await healer.aheal(question=question, failed_sql=failed.sql, error_msg=failed.error, context=context)
+        return await _atry_candidate(healed.query, db)
+
+    tasks = [asyncio.create_task(candidate(healer)) for healer in _heal_candidates()]
+    failures, errors = [], []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                data = await next_done
+            except CandidateFailed as e:
+                HEAL_CANDIDATE_RESULTS.inc(result=e.result)
+                failures.append(e)
+                continue
+            except Exception as e:
+                HEAL_CANDIDATE_RESULTS.inc(result="error")
+                errors.append(e)
+                continue
+            HEAL_CANDIDATE_RESULTS.inc(result="won")
+            HEAL_CANDIDATE_RESULTS.inc(len([t for t in tasks if not t.done()]), result="cancelled")
+            return data, failures
+    finally:
+        # A query already handed to the DB executor still runs to completion; only its result is dropped
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if not failures:
+        raise errors[0]
+    return None, failures
+
+async def arace_execute_and_heal_sql(question: str, sql_response, db: SQLDB, context: str, max_retries: int = 3):
+    """
+    aexecute_and_heal_sql with HEAL_CANDIDATES repairs raced per round instead of one.
+    Each round counts as one attempt; the earliest failure of a round seeds the next one.
+    """
+    try:
+        data = await _atry_candidate(sql_response.query, db)
+        SQL_ATTEMPTS.observe(1)
+        SQL_ROWS.observe(len(data.get("rows", [])))
+        return data, None
+    except CandidateFailed as e:
+        failed = e
+    fallback = failed.data
+
+    for attempt in range(2, max_retries + 1):
+        data, failures = await _arace_heal(question, failed, db, context)
+        if data is not None:
+            SQL_ATTEMPTS.observe(attempt)
+            SQL_ROWS.observe(len(data.get("rows", [])))
+            return data, None
+        failed = failures[0]
+        fallback = fallback or _empty_fallback(failures)
+
+    SQL_ATTEMPTS.observe(max_retries)
+    if fallback is not None:
+        # No candidate found rows; a query that ran and matched nothing is still an answer
+        SQL_ROWS.observe(0)
+        return fallback, None
+    return None, failed.error
+
+async def aexecute_and_heal_sql(question: str, sql_response, db: SQLDB, context: str, max_retries: int = 3):
     if not hasattr(sql_response, "query"):
         return None, "No SQL query generated"
+    if settings.HEAL_CANDIDATES > 1 and max_retries > 1:
+        return await arace_execute_and_heal_sql(question, sql_response, db, context, max_retries)
 
     current_sql = sql_response.query
 
     for attempt in range(1, max_retries + 1):
         try:
-            data = db.query_db(current_sql)
-
-            # Check for empty results
-            rows = data.get("rows", [])
-            columns = data.get("columns", [])
-
-            if not rows and not columns:
-                raise Exception("Query returned EMPTY results.")
-
+            catalog_error = await asyncio.to_thread(check_sql_against_catalog, current_sql)
+            if catalog_error:
+                raise Exception(catalog_error)
+            data = await arun_query(db, current_sql)
+            _ensure_not_empty(data)
+            data["sql"] = current_sql
+            SQL_ATTEMPTS.observe(attempt)
+            SQL_ROWS.observe(len(data.get("rows", [])))
             return data, None
 
         except Exception as e:
             if attempt < max_retries:
-                healed = self_healer.heal(
+                healed = await self_healer.aheal(
                     question=question,
                     failed_sql=current_sql,
                     error_msg=str(e),
@@ -115,9 +328,18 @@ def execute_and_heal_sql(question: str, sql_response, db: SQLDB, context: str, m
                 )
                 current_sql = healed.query
             else:
+                SQL_ATTEMPTS.observe(attempt)
                 return None, str(e)
 
     return None, "All retry attempts exhausted"
 
-def analyze_sql_results(question: str, data: dict):
-    return data_analyst.data_analyst(question, str(data))
+async def aanalyze_sql_results(question: str, data: dict):
+    # Summarizing a large result is CPU work, keep it off the event loop
+    summary = await asyncio.to_thread(summarize_for_analyst, data)
+    return await data_analyst.adata_analyst(question, summary)
+
+async def astream_sql_results_analysis(question: str, data: dict):
+    """Yield the analysis text chunk by chunk as the model generates it."""
+    summary = await asyncio.to_thread(summarize_for_analyst, data)
+    async for chunk in data_analyst.astream_data_analyst(question, summary):
+        yield chunk
@@ -0,0 +1,196 @@
+import re
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Optional
+import numpy as np
+from utils import convert_json_to_toon, iter_toon_table, count_tokens
+
+_DATE_PREFIX = re.compile(r"^\d{4}-\d{2}-\d{2}")
+# Keys are not worth summing per time bucket
+_ID_COLUMN = re.compile(r"(?:^|_)(?:id|Id|ID)$|[a-z](?:Id|ID)$")
+# Bucket key lengths over an ISO timestamp: YYYY, YYYY-MM, YYYY-MM-DD
+_BUCKETS = (("year", 4), ("month", 7), ("day", 10))
+
+
+def _plain(value: Any):
+    """Cell value as a JSON/TOON primitive."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _round(value: float):
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 4)
+
+
+def _column_kind(values: list) -> str:
+    if not values:
+        return "empty"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return "numeric"
+    if all(isinstance(v, str) and _DATE_PREFIX.match(v) for v in values):
+        return "datetime"
+    return "text"
+
+
+def _rows_as_dicts(columns: list[str], rows: list) -> list[dict]:
+    return [dict(zip(columns, (_plain(v) for v in row))) for row in rows]
+
+
+class ResultSummary:
+    """
+    Compact, token-budgeted description of a query result for the DataAnalystAgent.
+    Small results are passed through whole; larger ones are reduced to per-column stats
+    (count, nulls, min/max/mean/sum, distinct), top-k categories, time-series buckets and an
+    evenly spaced sample of rows, all encoded as TOON.
+    - token_budget: target size of the encoded summary
+    - sample_rows: maximum rows in the representative sample
+    - top_k: categories kept per text column
+    - max_buckets: time-series buckets kept per datetime column (most recent first)
+    """
+
+    def __init__(self, token_budget: int = 2000, sample_rows: int = 10, top_k: int = 5, max_buckets: int = 24):
+        self.token_budget = token_budget
+        self.sample_rows = sample_rows
+        self.top_k = top_k
+        self.max_buckets = max_buckets
+
+    def encode(self, data: dict) -> str:
+        columns = list(data.get("columns") or [])
+        rows = data.get("rows")
+        if rows is None and "data" in data:
+            # Column-oriented result
+            rows = [list(r) for r in zip(*data["data"])]
+        rows = rows or []
+        truncated = bool(data.get("truncated"))
+
+        # Every cell costs at least a token, so only try the whole result when it can possibly fit
+        if len(rows) * max(len(columns), 1) <= self.token_budget:
+            full = self._encode_all(columns, rows, truncated)
+            if count_tokens(full) <= self.token_budget:
+                return full
+
+        summary = self._summarize(columns, rows, truncated)
+        sample_size = min(self.sample_rows, len(rows))
+        while True:
+            summary["sample"] = self._sample(columns, rows, sample_size)
+            text = convert_json_to_toon(summary)
+            if count_tokens(text) <= self.token_budget:
+                return text
+            if sample_size > 0:
+                sample_size //= 2
+            elif not self._drop_detail(summary):
+                return text
+
+    @staticmethod
+    def _encode_all(columns: list[str], rows: list, truncated: bool) -> str:
+        header = {"row_count": len(rows), "truncated": truncated}
+        if len(set(columns)) != len(columns):
+            return convert_json_to_toon({**header, "rows": _rows_as_dicts(columns, rows)})
+        # Rows go straight into the tabular form, without a dict per row
+        table = iter_toon_table("rows", columns, ([_plain(v) for v in row] for row in rows), count=len(rows))
+        return "\n".join([convert_json_to_toon(header), *table])
+
+    @staticmethod
+    def _drop_detail(summary: dict) -> bool:
+        """Once the sample is gone, drop time series and then category lists. False when nothing is left to drop."""
+        for key in ("time_series", "top_values"):
+            if key in summary:
+                summary.pop(key)
+                return True
+        return False
+
+    def _summarize(self, columns: list[str], rows: list, truncated: bool) -> dict:
+        stats, top_values, time_series = [], {}, {}
+        numeric_columns: dict[str, np.ndarray] = {}
+        datetime_columns: dict[str, np.ndarray] = {}
+
+        for index, name in enumerate(columns):
+            raw = [_plain(row[index]) for row in rows]
+            present = [v for v in raw if v is not None]
+            kind = _column_kind(present)
+            entry = {
+                "column": name, "type": kind, "count": len(present), "nulls": len(raw) - len(present),
+                "distinct": None, "min": None, "max": None, "mean": None, "sum": None,
+            }
+
+            if kind == "numeric":
+                values = np.asarray(present, dtype=np.float64)
+                entry.update(
+                    min=_round(values.min()), max=_round(values.max()),
+                    mean=_round(values.mean()), sum=_round(values.sum()),
+                    distinct=int(np.unique(values).size),
+                )
+                if len(present) == len(raw) and not _ID_COLUMN.search(name):
+                    numeric_columns[name] = values
+            elif kind in ("datetime", "text"):
+                values = np.asarray([str(v) for v in present], dtype=object)
+                uniques, counts = np.unique(values.astype(str), return_counts=True)
+                entry["distinct"] = int(uniques.size)
+                if kind == "datetime":
+                    entry.update(min=str(uniques[0]), max=str(uniques[-1]))
+                    if len(present) == len(raw):
+                        datetime_columns[name] = values.astype(str)
+                elif uniques.size < len(present):
+                    # Only columns with repeats are categorical enough for a top-k
+                    order = np.argsort(-counts, kind="stable")[: self.top_k]
+                    top_values[name] = [
+                        {"value": str(uniques[i]), "rows": int(counts[i])} for i in order
+                    ]
+            stats.append(entry)
+
+        for name, values in datetime_columns.items():
+            time_series[name] = self._time_series(values, numeric_columns)
+
+        summary = {
+            "row_count": len(rows),
+            "truncated": truncated,
+            "columns": stats,
+        }
+        if top_values:
+            summary["top_values"] = top_values
+        if time_series:
+            summary["time_series"] = time_series
+        return summary
+
+    def _time_series(self, values: np.ndarray, numeric_columns: dict[str, np.ndarray]) -> list[dict]:
+        """Rows (and sums of fully populated numeric columns) per year, month or day, whichever fits max_buckets."""
+        for granularity, width in _BUCKETS[::-1]:
+            keys = np.array([v[:width] for v in values], dtype=object).astype(str)
+            buckets, inverse = np.unique(keys, return_inverse=True)
+            if buckets.size <= self.max_buckets or granularity == "year":
+                break
+
+        counts = np.bincount(inverse, minlength=buckets.size)
+        sums = {
+            name: np.bincount(inverse, weights=column, minlength=buckets.size)
+            for name, column in list(numeric_columns.items())[:3]
+        }
+        series = []
+        for i in range(buckets.size)[-self.max_buckets:]:
+            point = {"period": str(buckets[i]), "rows": int(counts[i])}
+            for name, totals in sums.items():
+                point[f"sum_{name}"] = _round(totals[i])
+            series.append(point)
+        return series
+
+    @staticmethod
+    def _sample(columns: list[str], rows: list, size: int) -> list[dict]:
+        if size <= 0 or not rows:
+            return []
+        indices = np.unique(np.linspace(0, len(rows) - 1, num=size).astype(int))
+        return _rows_as_dicts(columns, [rows[i] for i in indices])
+
+
+def summarize_result(data: Optional[dict], token_budget: int = 2000, **options) -> str:
+    """TOON-encoded result summary for the analyst prompt."""
+    if not data:
+        return convert_json_to_toon({"row_count": 0, "rows": []})
+    return ResultSummary(token_budget=token_budget, **options).encode(data)
@@ -0,0 +1,138 @@
+import math
+import base64
+import decimal
+import datetime
+from typing import Iterator, Optional
+from src.config import settings
+
+# Checked in order: bool before int, datetime before date
+_LOGICAL_TYPES = (
+    (bool, "boolean"),
+    (int, "integer"),
+    (float, "float"),
+    (decimal.Decimal, "decimal"),
+    (datetime.datetime, "datetime"),
+    (datetime.date, "date"),
+    (datetime.time, "time"),
+    ((bytes, bytearray, memoryview), "binary"),
+    (str, "string"),
+)
+
+ENCODINGS = ("json", "arrow")
+
+
+def _logical_type(value) -> str:
+    for python_type, name in _LOGICAL_TYPES:
+        if isinstance(value, python_type):
+            return name
+    return "string"
+
+
+def _json_float(value):
+    return None if isinstance(value, float) and not math.isfinite(value) else value
+
+
+# JSON-safe conversion per logical type; decimals travel as strings to keep their precision
+_TO_JSON = {
+    "float": _json_float,
+    "decimal": str,
+    "datetime": lambda v: v.isoformat(),
+    "date": lambda v: v.isoformat(),
+    "time": lambda v: v.isoformat(),
+    "binary": lambda v: base64.b64encode(bytes(v)).decode("ascii"),
+    "string": str,
+}
+
+
+def _json_value(value, logical: str):
+    """
+    JSON-safe form of one value of a column of the given logical type.
+    A value that doesn't match its column's type (e.g. a Decimal in an integer column) is converted by its own type;
+    string columns always send text.
+    """
+    if value is None:
+        return None
+    convert = _TO_JSON.get(logical if logical == "string" else _logical_type(value))
+    return value if convert is None else convert(value)
+
+
+def _column_values(data: dict) -> tuple[list, int]:
+    """Column lists of a query_db result (either orient) and its row count."""
+    if "data" in data:
+        return data["data"], data.get("row_count", len(data["data"][0]) if data["data"] else 0)
+    rows = data.get("rows", [])
+    return [list(values) for values in zip(*rows)] if rows else [[] for _ in data.get("columns", [])], len(rows)
+
+
+def column_types(columns: list[list]) -> list[str]:
+    """Logical type of each column from its first non-null value ("null" when it has none)."""
+    return [next((_logical_type(v) for v in values if v is not None), "null") for values in columns]
+
+
+def _encode_arrow(names: list[str], types: list[str], columns: list[list]) -> bytes:
+    """One self-contained Arrow IPC stream (schema + a single record batch)."""
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("Arrow encoding needs the optional pyarrow package (pip install pyarrow).") from e
+    arrays = []
+    for values, logical in zip(columns, types):
+        if logical == "null":
+            arrays.append(pa.nulls(len(values)))
+        elif logical == "string":
+            arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+        else:
+            try:
+                arrays.append(pa.array(values))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Mixed-type column, fall back to its text form
+                arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+    batch = pa.RecordBatch.from_arrays(arrays, names=names)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def iter_result_frames(data: dict, batch_size: Optional[int] = None, encoding: str = "json") -> Iterator[dict]:
+    """
+    Typed, column-oriented transport of a query result, one frame at a time.
+    - First frame: {"columns": [{"name", "type"}], "row_count", "truncated", "sql", "encoding"}
+    - Then one frame per batch_size rows (default RESULT_BATCH_ROWS):
+      json  -> {"offset", "data": [values of column 0, values of column 1, ...]}
+      arrow -> {"offset", "rows", "arrow": base64 Arrow IPC stream}
+    Each batch is converted on its own, so the whole result is never serialized at once.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown result encoding: {encoding}")
+    batch_size = batch_size or settings.RESULT_BATCH_ROWS
+    names = list(data.get("columns", []))
+    columns, row_count = _column_values(data)
+    types = column_types(columns)
+
+    yield {
+        "columns": [{"name": name, "type": logical} for name, logical in zip(names, types)],
+        "row_count": row_count,
+        "truncated": data.get("truncated", False),
+        "sql": data.get("sql"),
+        "encoding": encoding,
+    }
+
+    for offset in range(0, row_count, batch_size):
+        batch = [values[offset:offset + batch_size] for values in columns]
+        if encoding == "arrow":
+            payload = base64.b64encode(_encode_arrow(names, types, batch)).decode("ascii")
+            yield {"offset": offset, "rows": len(batch[0]) if batch else 0, "arrow": payload}
+            continue
+        yield {
+            "offset": offset,
+            "data": [[_json_value(v, logical) for v in values] for values, logical in zip(batch, types)],
+        }
@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from src.config import settings
+
+
+def _normalize(vector: list[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+# Numbers (years, limits, amounts), quoted values and month names: embeddings barely move when one of these
+# changes ("top 5 products in 2023" vs "top 10 products in 2024"), but the answer does
+_LITERAL = re.compile(
+    r"\d+(?:\.\d+)?|'[^']*'|\"[^\"]*\"|"
+    r"\b(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b",
+    re.IGNORECASE,
+)
+
+
+def question_literals(question: str) -> list[str]:
+    """Literal values of a question, sorted; two questions can share an answer only when these are equal."""
+    return sorted(match.lower()[:3] if match[0].isalpha() else match.lower() for match in _LITERAL.findall(question))
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on the question embedding.
+    A lookup returns the most similar stored answer whose cosine similarity clears the threshold
+    and whose question has the same literal values (numbers, quoted values, months) as the one asked.
+    - threshold: minimum cosine similarity for a hit
+    - ttl: seconds an entry stays valid (0 keeps entries forever)
+    - max_entries: LRU bound, least recently used entries are evicted first
+    - path: optional SQLite file so entries survive restarts
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600, max_entries: int = 512, path: Optional[str] = None):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        # Stacked entry vectors for one matrix-vector product per lookup; rebuilt after entries change
+        self._index: Optional[tuple[list[str], np.ndarray]] = None
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._open_disk()
+
+    def _open_disk(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_cache "
+            "(key TEXT PRIMARY KEY, question TEXT, vector TEXT, payload TEXT, created_at REAL)"
+        )
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, question, vector, payload, created_at FROM semantic_cache ORDER BY created_at"
+        ).fetchall()
+        for key, question, vector, payload, created_at in rows:
+            self._entries[key] = {
+                "question": question,
+                "vector": _normalize(json.loads(vector)),
+                "created_at": created_at,
+                **json.loads(payload),
+            }
+        self._evict_locked()
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return bool(self.ttl) and now - entry["created_at"] > self.ttl
+
+    def _index_locked(self) -> tuple[list[str], np.ndarray]:
+        if self._index is None:
+            keys = list(self._entries)
+            self._index = (keys, np.stack([self._entries[k]["vector"] for k in keys]))
+        return self._index
+
+    def lookup(self, vector: Optional[list[float]], question: str = "") -> Optional[dict]:
+        """
+        Return the best cached entry for the vector and question, or None.
+        Blocking (a matrix product over every entry under the lock); call it off the event loop.
+        """
+        if not vector:
+            return None
+        query = _normalize(vector)
+        literals = question_literals(question)
+        now = time.time()
+        with self._lock:
+            self._remove_locked([k for k, e in self._entries.items() if self._expired(e, now)])
+            if not self._entries:
+                return None
+            keys, matrix = self._index_locked()
+            if matrix.shape[1] != query.shape[0]:
+                # Entries from a different embedding model can't match
+                return None
+            scores = matrix @ query
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for i in candidates[np.argsort(-scores[candidates])]:
+                entry = self._entries[keys[i]]
+                if question_literals(entry["question"]) != literals:
+                    continue
+                self._entries.move_to_end(keys[i])
+                return {
+                    "question": entry["question"],
+                    "sql": entry["sql"],
+                    "data": entry["data"],
+                    "analysis": entry["analysis"],
+                    "score": float(scores[i]),
+                }
+            return None
+
+    def store(self, question: str, vector: Optional[list[float]], sql: str, data: dict, analysis: str):
+        """Add an answer; blocking (SQLite write when persisted), call it off the event loop."""
+        if not vector:
+            return
+        key = uuid.uuid4().hex
+        entry = {
+            "question": question,
+            "vector": _normalize(vector),
+            "created_at": time.time(),
+            "sql": sql,
+            "data": data,
+            "analysis": analysis,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._index = None
+            if self._db is not None:
+                try:
+                    payload = json.dumps({"sql": sql, "data": data, "analysis": analysis}, default=str)
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO semantic_cache VALUES (?, ?, ?, ?, ?)",
+                        (key, question, json.dumps(entry["vector"].tolist()), payload, entry["created_at"]),
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    logging.error(f"Failed to persist semantic cache entry: {e}")
+            self._evict_locked()
+
+    def invalidate(self, question: Optional[str] = None) -> int:
+        """Drop every entry, or only those stored for the given question. Returns the number removed."""
+        with self._lock:
+            if question is None:
+                keys = list(self._entries)
+            else:
+                target = question.strip().lower()
+                keys = [k for k, e in self._entries.items() if e["question"].strip().lower() == target]
+            self._remove_locked(keys)
+            return len(keys)
+
+    def _evict_locked(self):
+        overflow = len(self._entries) - self.max_entries
+        if overflow > 0:
+            self._remove_locked(list(self._entries)[:overflow])
+
+    def _remove_locked(self, keys: list[str]):
+        """Drop entries from memory and, in one statement, from disk."""
+        if not keys:
+            return
+        for key in keys:
+            self._entries.pop(key, None)
+        self._index = None
+        if self._db is not None:
+            try:
+                self._db.execute("DELETE FROM semantic_cache WHERE key IN (SELECT value FROM json_each(?))", (json.dumps(keys),))
+                self._db.commit()
+            except Exception as e:
+                logging.error(f"Failed to delete semantic cache entries: {e}")
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_shared_cache: Optional[SemanticCache] = None
+_shared_lock = threading.Lock()
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Process-wide semantic cache, or None when SEMANTIC_CACHE_ENABLED is off."""
+    global _shared_cache
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = SemanticCache(
+                    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                    ttl=settings.SEMANTIC_CACHE_TTL,
+                    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                    path=settings.SEMANTIC_CACHE_PATH or None,
+                )
+    return _shared_cache
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Optional
+from src.metrics import SINGLE_FLIGHT_REQUESTS
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+class _Flight:
+    """One in-flight execution: the events produced so far and how it ended."""
+
+    def __init__(self):
+        self.events: list = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event):
+        self.events.append(event)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self):
+        # Wake every waiting subscriber, then arm a fresh event for the next change
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self):
+        await self._changed.wait()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests onto one execution of an async generator.
+    The first caller for a key starts the producer as a task; every caller (including the
+    first) streams its events from the start, so late joiners replay what they missed.
+    - A producer failure is re-raised in every subscriber.
+    - A subscriber that disconnects only detaches; the producer is cancelled once nobody is left.
+    - The key is released when the producer ends, so later requests start a fresh execution.
+    """
+
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def stream(self, key: str, producer: Callable[[], AsyncIterator]) -> AsyncIterator:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._run(key, flight, producer))
+            SINGLE_FLIGHT_REQUESTS.inc(role="leader")
+        else:
+            SINGLE_FLIGHT_REQUESTS.inc(role="follower")
+
+        flight.subscribers += 1
+        position = 0
+        try:
+            while True:
+                while position < len(flight.events):
+                    yield flight.events[position]
+                    position += 1
+                if flight.done:
+                    break
+                await flight.wait()
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done and flight.task is not None:
+                # Nobody is listening anymore; new requests must not attach to the cancelled flight
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def _run(self, key: str, flight: _Flight, producer: Callable[[], AsyncIterator]):
+        error = None
+        try:
+            async for event in producer():
+                flight.publish(event)
+        except asyncio.CancelledError as e:
+            error = e
+            raise
+        except Exception as e:
+            logging.error(f"Coalesced request failed: {e}")
+            error = e
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.finish(error)
+
+
+_shared_flights: Optional[SingleFlight] = None
+
+def get_single_flight() -> SingleFlight:
+    """Process-wide coalescer; only used from the event loop, so no lock is needed."""
+    global _shared_flights
+    if _shared_flights is None:
+        _shared_flights = SingleFlight()
+    return _shared_flights